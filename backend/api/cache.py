@@ -0,0 +1,94 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
+from rest_framework.response import Response
+
+
+def get_version_key(model):
+    '''Ключ версии справочника в кэше'''
+    return f'catalogue:{model._meta.label_lower}:version'
+
+
+def bump_catalogue_version(model):
+    '''Метод для сброса кэша справочника после изменений'''
+    version = time.time()
+    caches['versions'].set(get_version_key(model), version, None)
+    return version
+
+
+def get_catalogue_version(model):
+    '''Метод получения текущей версии справочника'''
+    version = caches['versions'].get(get_version_key(model))
+    if version is None:
+        return bump_catalogue_version(model)
+    return version
+
+
+class CatalogueCacheMixin:
+    '''Кэширование ответов справочников с поддержкой ETag'''
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request,
+                                        *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request,
+                                        *args, **kwargs)
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        '''Ответ из кэша или 304 для условного запроса'''
+        model = self.get_queryset().model
+        version = get_catalogue_version(model)
+        path_hash = hashlib.md5(
+            request.get_full_path().encode()
+        ).hexdigest()
+        etag = quote_etag(f'{version}:{path_hash}')
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        key = f'catalogue:{model._meta.label_lower}:{version}:{path_hash}'
+        data = cache.get(key)
+        if data is None:
+            data = handler(request, *args, **kwargs).data
+            cache.set(key, data, settings.CATALOGUE_CACHE_TIMEOUT)
+        response = Response(data)
+        response['ETag'] = etag
+        return response
+
+
+class AnonymousListCacheMixin:
+    '''Кэширование списка для анонимных пользователей по параметрам фильтра'''
+    cached_list_params = ()
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        data = cache.get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            data = response.data
+            cache.set(key, data, settings.ANONYMOUS_LIST_CACHE_TIMEOUT)
+        return Response(data)
+
+    def get_list_cache_key(self, request):
+        '''Ключ из версии данных и упорядоченных параметров запроса'''
+        params = request.query_params
+        if (not request.user.is_anonymous
+                or not set(params) <= set(self.cached_list_params)):
+            return None
+        query = urlencode(sorted(
+            (name, sorted(set(params.getlist(name)))) for name in params
+        ), doseq=True)
+        model = self.queryset.model
+        query_hash = hashlib.md5(
+            f'{request.get_host()}?{query}'.encode()
+        ).hexdigest()
+        return (f'list:{model._meta.label_lower}:'
+                f'{get_catalogue_version(model)}:{query_hash}')
@@ -1,3 +1,7 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
                                            FilterSet, ModelChoiceFilter,
                                            ModelMultipleChoiceFilter)
@@ -5,15 +9,55 @@ from django_filters.rest_framework import (BooleanFilter, CharFilter,
 from recipes.models import Ingredient, Recipe, Tag
 from users.models import User
 
+SEARCH_CONFIG = 'russian'
+
 
 class IngredientFilter(FilterSet):
     '''Фильтр ингридиентов'''
-    name = CharFilter(lookup_expr='istartswith')
+    name = CharFilter(method='get_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_name(self, queryset, name, value):
+        '''Поиск по началу названия через индекс lower(name)'''
+        return queryset.annotate(name_lower=Lower('name')).filter(
+            name_lower__startswith=value.lower()
+        )
+
+
+def autocomplete_ingredients(queryset, value, limit):
+    '''Подсказки ингридиентов: сначала по началу названия, затем вхождения'''
+    value = value.lower()
+    return queryset.annotate(name_lower=Lower('name')).filter(
+        name_lower__contains=value
+    ).annotate(
+        rank=Case(
+            When(name_lower__startswith=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('rank', 'name')[:limit]
+
+
+def search_recipes(queryset, value):
+    '''Полнотекстовый поиск рецептов с ранжированием по ts_rank'''
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date', '-id')
+    return queryset.filter(
+        Q(name__icontains=value) | Q(text__icontains=value)
+    ).annotate(
+        rank=Case(
+            When(name__icontains=value, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('rank', '-pub_date', '-id')
+
 
 class TagFilter(FilterSet):
     '''Фильтр тэгов'''
@@ -27,10 +71,12 @@ class TagFilter(FilterSet):
     is_in_shopping_cart = BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
 
     def get_is_favorited(self, queryset, name, value):
         '''Метод для избранного'''
@@ -45,3 +91,7 @@ class TagFilter(FilterSet):
         if bool(value) and not self.request.user.is_anonymous:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset.exclude(shopping_cart__user=self.request.user)
+
+    def get_search(self, queryset, name, value):
+        '''Метод для полнотекстового поиска'''
+        return search_recipes(queryset, value)
@@ -0,0 +1,233 @@
+import json
+import math
+import resource
+import time
+import tracemalloc
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.metrics import QueryStats
+from api.query_budget import PNG, get_seeded_objects
+from recipes.models import Recipe
+from users.models import ADMIN, User
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(values, rank):
+    '''Перцентиль методом ближайшего ранга'''
+    values = sorted(values)
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+def get_content(response):
+    '''Полное чтение ответа, в том числе потокового'''
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, число SQL-запросов и пиковую память '
+            'для каждого эндпоинта API и выводит результат в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=30,
+                            help='Количество замеров на эндпоинт')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--user', type=int,
+                            help='id пользователя, от имени которого '
+                                 'выполняются запросы')
+        parser.add_argument('--output', help='Файл для результата')
+
+    def get_scenarios(self, user, recipe, author, tag, ingredients):
+        '''Запросы ко всем эндпоинтам API; записи идут парами туда-обратно'''
+        client = APIClient()
+        client.force_authenticate(user)
+        anonymous = APIClient()
+        ingredient = ingredients[0]
+        recipe_ids = list(Recipe.objects.exclude(
+            favorites__user=user
+        ).values_list('id', flat=True)[:10])
+        created = {}
+
+        def create_recipe():
+            response = client.post(reverse('api:recipes-list'), {
+                'ingredients': [{'id': ingredient.id, 'amount': 10}],
+                'tags': [tag.id], 'image': PNG, 'name': 'Бенчмарк',
+                'text': 'Бенчмарк', 'cooking_time': 10,
+            }, format='json')
+            created['id'] = response.data.get('id')
+            return response
+
+        def recipe_url(name):
+            return reverse(name, args=(created['id'],))
+
+        scenarios = [
+            ('GET tags-list', lambda: client.get(reverse('api:tags-list'))),
+            ('GET tags-detail', lambda: client.get(
+                reverse('api:tags-detail', args=(tag.id,)))),
+            ('GET ingredients-list', lambda: client.get(
+                reverse('api:ingredients-list'),
+                {'name': ingredient.name[:3]})),
+            ('GET ingredients-autocomplete', lambda: client.get(
+                reverse('api:ingredients-autocomplete'),
+                {'name': ingredient.name[:3]})),
+            ('GET ingredients-detail', lambda: client.get(
+                reverse('api:ingredients-detail', args=(ingredient.id,)))),
+            ('GET recipes-list', lambda: client.get(
+                reverse('api:recipes-list'))),
+            ('GET recipes-list anonymous', lambda: anonymous.get(
+                reverse('api:recipes-list'))),
+            ('GET recipes-list page 10', lambda: client.get(
+                reverse('api:recipes-list'), {'page': 10})),
+            ('GET recipes-list cursor', lambda: client.get(
+                reverse('api:recipes-list'), {'cursor': ''})),
+            ('GET recipes-list tags', lambda: client.get(
+                reverse('api:recipes-list'), {'tags': tag.slug})),
+            ('GET recipes-list search', lambda: client.get(
+                reverse('api:recipes-list'),
+                {'search': recipe.name.split()[0]})),
+            ('GET recipes-list is_favorited', lambda: client.get(
+                reverse('api:recipes-list'), {'is_favorited': 1})),
+            ('GET recipes-detail', lambda: client.get(
+                reverse('api:recipes-detail', args=(recipe.id,)))),
+            ('GET recipes-cart-summary', lambda: client.get(
+                reverse('api:recipes-cart-summary'))),
+            ('GET recipes-download-shopping-cart', lambda: client.get(
+                reverse('api:recipes-download-shopping-cart'))),
+            ('GET recipes-download-shopping-cart csv', lambda: client.get(
+                reverse('api:recipes-download-shopping-cart'),
+                {'format': 'csv'})),
+            ('POST recipes-favorite', lambda: client.post(
+                reverse('api:recipes-favorite', args=(recipe.id,)))),
+            ('DELETE recipes-favorite', lambda: client.delete(
+                reverse('api:recipes-favorite', args=(recipe.id,)))),
+            ('POST recipes-shopping-cart', lambda: client.post(
+                reverse('api:recipes-shopping-cart', args=(recipe.id,)))),
+            ('DELETE recipes-shopping-cart', lambda: client.delete(
+                reverse('api:recipes-shopping-cart', args=(recipe.id,)))),
+            ('POST recipes-favorite-bulk', lambda: client.post(
+                reverse('api:recipes-favorite-bulk'),
+                {'ids': recipe_ids}, format='json')),
+            ('DELETE recipes-favorite-bulk', lambda: client.delete(
+                reverse('api:recipes-favorite-bulk'),
+                {'ids': recipe_ids}, format='json')),
+            ('POST recipes-shopping-cart-bulk', lambda: client.post(
+                reverse('api:recipes-shopping-cart-bulk'),
+                {'ids': recipe_ids}, format='json')),
+            ('DELETE recipes-shopping-cart-bulk', lambda: client.delete(
+                reverse('api:recipes-shopping-cart-bulk'),
+                {'ids': recipe_ids}, format='json')),
+            ('POST recipes-list', create_recipe),
+            ('PATCH recipes-detail', lambda: client.patch(
+                recipe_url('api:recipes-detail'),
+                {'ingredients': [{'id': ingredient.id, 'amount': 20}],
+                 'tags': [tag.id], 'image': PNG, 'name': 'Бенчмарк',
+                 'text': 'Бенчмарк', 'cooking_time': 20}, format='json')),
+            ('DELETE recipes-detail', lambda: client.delete(
+                recipe_url('api:recipes-detail'))),
+            ('GET users-list', lambda: client.get(
+                reverse('api:users-list'))),
+            ('GET users-list cursor', lambda: client.get(
+                reverse('api:users-list'), {'cursor': ''})),
+            ('GET users-me', lambda: client.get(reverse('api:users-me'))),
+            ('GET users-detail', lambda: client.get(
+                reverse('api:users-detail', args=(author.id,)))),
+            ('GET users-subscriptions', lambda: client.get(
+                reverse('api:users-subscriptions'), {'recipes_limit': 3})),
+            ('POST users-subscribe', lambda: client.post(
+                reverse('api:users-subscribe', args=(author.id,)))),
+            ('DELETE users-subscribe', lambda: client.delete(
+                reverse('api:users-subscribe', args=(author.id,)))),
+            ('POST users-subscribe-bulk', lambda: client.post(
+                reverse('api:users-subscribe-bulk'),
+                {'ids': [author.id]}, format='json')),
+            ('DELETE users-subscribe-bulk', lambda: client.delete(
+                reverse('api:users-subscribe-bulk'),
+                {'ids': [author.id]}, format='json')),
+        ]
+        admin = User.objects.filter(role=ADMIN).first()
+        if admin is not None:
+            admin_client = APIClient()
+            admin_client.force_authenticate(admin)
+            scenarios.append(('GET metrics', lambda: admin_client.get(
+                reverse('api:metrics'))))
+        return scenarios
+
+    @staticmethod
+    def measure(request):
+        '''Один запрос: время, число SQL-запросов и статус ответа'''
+        stats = QueryStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = request()
+            get_content(response)
+        return time.perf_counter() - start, stats.count, response.status_code
+
+    @staticmethod
+    def measure_memory(request):
+        '''Пиковая память, выделенная Python за один запрос'''
+        tracemalloc.start()
+        try:
+            get_content(request())
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def run(self, scenarios, requests, warmup):
+        '''Прогон всех сценариев по кругу, чтобы пары записей чередовались'''
+        samples = {name: [] for name, _ in scenarios}
+        for iteration in range(warmup + requests):
+            for name, request in scenarios:
+                result = self.measure(request)
+                if iteration >= warmup:
+                    samples[name].append(result)
+        memory = {name: self.measure_memory(request)
+                  for name, request in scenarios}
+        return samples, memory
+
+    @staticmethod
+    def summarize(samples, memory):
+        results = {}
+        for name, rows in samples.items():
+            durations = [duration * 1000 for duration, _, _ in rows]
+            queries = [count for _, count, _ in rows]
+            results[name] = {
+                **{f'p{rank}_ms': round(percentile(durations, rank), 3)
+                   for rank in PERCENTILES},
+                'queries': max(queries),
+                'queries_min': min(queries),
+                'peak_memory_kb': round(memory[name] / 1024, 1),
+                'errors': sum(status >= 400 for _, _, status in rows),
+            }
+        return results
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должно быть больше нуля')
+        objects = get_seeded_objects(options['user'])
+        if objects is None:
+            raise CommandError('Заполните базу данных: manage.py seed')
+        user = objects[0]
+        samples, memory = self.run(self.get_scenarios(*objects),
+                                   options['requests'], options['warmup'])
+        report = json.dumps({
+            'database': connection.vendor,
+            'user': user.id,
+            'recipes': Recipe.objects.count(),
+            'users': User.objects.count(),
+            'requests': options['requests'],
+            'max_rss_kb': resource.getrusage(
+                resource.RUSAGE_SELF
+            ).ru_maxrss,
+            'endpoints': self.summarize(samples, memory),
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(report)
+        else:
+            self.stdout.write(report)
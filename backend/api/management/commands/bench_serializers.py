@@ -0,0 +1,88 @@
+import json
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeFastReadSerializer, RecipeReadSerializer
+from api.views import RecipeViewSet
+from users.models import User
+
+PATHS = {
+    'drf': (RecipeReadSerializer, JSONRenderer),
+    'fast': (RecipeFastReadSerializer, FastJSONRenderer),
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает процессорное время сериализации и рендеринга '
+            'страницы рецептов: DRF и быстрый путь')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6,
+                            help='Рецептов на странице')
+        parser.add_argument('--rounds', type=int, default=200)
+        parser.add_argument('--action', choices=('list', 'retrieve'),
+                            default='list')
+        parser.add_argument('--user', type=int,
+                            help='id пользователя; по умолчанию аноним')
+
+    def get_context(self, action, user_id):
+        '''Запрос и вьюсет, как при обычном чтении рецептов'''
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = (User.objects.get(id=user_id) if user_id is not None
+                        else AnonymousUser())
+        view = RecipeViewSet(request=request, action=action,
+                             format_kwarg=None, args=(), kwargs={})
+        return view, {'request': request, 'view': view, 'format': None}
+
+    @staticmethod
+    def measure(rounds, function):
+        '''Процессорное время одного вызова в миллисекундах'''
+        start = time.process_time()
+        for _ in range(rounds):
+            result = function()
+        return (time.process_time() - start) * 1000 / rounds, result
+
+    def run(self, recipes, context, rounds):
+        results = {}
+        for name, (serializer_class, renderer_class) in PATHS.items():
+            serialize_ms, data = self.measure(
+                rounds,
+                lambda: serializer_class(recipes, many=True,
+                                         context=context).data
+            )
+            render_ms, content = self.measure(
+                rounds, lambda: renderer_class().render(data)
+            )
+            results[name] = {
+                'serialize_ms': round(serialize_ms, 3),
+                'render_ms': round(render_ms, 3),
+                'total_ms': round(serialize_ms + render_ms, 3),
+                'content': content,
+            }
+        return results
+
+    def handle(self, *args, **options):
+        view, context = self.get_context(options['action'], options['user'])
+        recipes = list(view.get_queryset()[:options['limit']])
+        if not recipes:
+            raise CommandError('Заполните базу данных: manage.py seed')
+        results = self.run(recipes, context, options['rounds'])
+        contents = {result.pop('content') for result in results.values()}
+        if len(contents) != 1:
+            raise CommandError('Быстрый путь отдаёт другой JSON')
+        self.stdout.write(json.dumps({
+            'recipes': len(recipes),
+            'action': options['action'],
+            'rounds': options['rounds'],
+            'bytes': len(contents.pop()),
+            'speedup': round(
+                results['drf']['total_ms'] / results['fast']['total_ms'], 2
+            ),
+            **results,
+        }, ensure_ascii=False, indent=2))
@@ -0,0 +1,124 @@
+from django.core.cache import cache
+from django.core.management import BaseCommand, CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.query_budget import (AUTHENTICATED_ONLY, PAGED, PNG, READ_BUDGETS,
+                              WRITE_BUDGETS, QueryBudget, QueryBudgetExceeded,
+                              get_reads, get_seeded_objects)
+
+ROWS = (1, 20)
+
+
+class Command(BaseCommand):
+    help = ('Проверяет бюджеты SQL-запросов каждого действия API '
+            'для анонимного и авторизованного пользователя')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int,
+                            help='id пользователя, от имени которого '
+                                 'выполняются запросы')
+
+    def get_writes(self, client, recipe, author, tag, ingredients):
+        '''Записи парами туда-обратно, чтобы не менять данные'''
+        recipe_data = {
+            'ingredients': [{'id': ingredient.id, 'amount': 10}
+                            for ingredient in ingredients],
+            'tags': [tag.id], 'image': PNG, 'name': 'Бюджет запросов',
+            'text': 'Бюджет запросов', 'cooking_time': 10,
+        }
+        bulk = {'ids': [recipe.id]}
+        writes = []
+        for name, args, data in (
+            ('recipes-favorite', (recipe.id,), None),
+            ('recipes-shopping-cart', (recipe.id,), None),
+            ('recipes-favorite-bulk', (), bulk),
+            ('recipes-shopping-cart-bulk', (), bulk),
+            ('users-subscribe', (author.id,), None),
+            ('users-subscribe-bulk', (), {'ids': [author.id]}),
+        ):
+            url = reverse(f'api:{name}', args=args)
+            for method in (client.post, client.delete):
+                writes.append((
+                    f'{method.__name__.upper()} {name}',
+                    lambda method=method, url=url, data=data: method(
+                        url, data, format='json'
+                    )
+                ))
+        created = {}
+
+        def create():
+            response = client.post(reverse('api:recipes-list'), recipe_data,
+                                   format='json')
+            created['url'] = reverse('api:recipes-detail',
+                                     args=(response.data['id'],))
+            return response
+
+        def remove_ingredients():
+            return client.patch(created['url'], {
+                'ingredients': recipe_data['ingredients'][:1]
+            }, format='json')
+
+        return writes + [
+            ('POST recipes-list', create),
+            ('PATCH recipes-detail', lambda: client.patch(
+                created['url'], recipe_data, format='json'
+            )),
+            ('PATCH recipes-detail (remove ingredients)', remove_ingredients),
+            ('DELETE recipes-detail', lambda: client.delete(created['url'])),
+        ]
+
+    def check_action(self, name, budget, request):
+        '''Запрос с холодным кэшем в пределах бюджета'''
+        cache.clear()
+        try:
+            with QueryBudget(budget, name) as queries:
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+        except QueryBudgetExceeded as error:
+            self.stderr.write(self.style.ERROR(str(error)))
+            return False
+        self.stdout.write(f'{name}: {len(queries.queries)}/{budget} '
+                          f'[{response.status_code}]')
+        return True
+
+    def check_reads(self, client, label, reads):
+        '''Бюджет не зависит от размера страницы: 1 и 20 строк'''
+        results = []
+        for name, args, params in reads:
+            url = reverse(f'api:{name}', args=args)
+            for rows in ROWS if name in PAGED else (None,):
+                query = dict(params)
+                if rows is not None:
+                    query.update(limit=rows, recipes_limit=rows)
+                results.append(self.check_action(
+                    f'GET {name} {label}' + (f' rows={rows}' if rows else ''),
+                    READ_BUDGETS[name],
+                    lambda url=url, query=query: client.get(url, query)
+                ))
+        return results
+
+    def handle(self, *args, **options):
+        objects = get_seeded_objects(options['user'])
+        if objects is None:
+            raise CommandError('Заполните базу данных: manage.py seed')
+        user, recipe, author, tag, ingredients = objects
+        client = APIClient()
+        client.force_authenticate(user)
+        reads = get_reads(recipe, author, tag, ingredients[0])
+        results = self.check_reads(APIClient(), 'anonymous', [
+            read for read in reads if read[0] not in AUTHENTICATED_ONLY
+        ])
+        results += self.check_reads(client, 'authenticated', reads)
+        results += [
+            self.check_action(name, WRITE_BUDGETS[name], request)
+            for name, request in self.get_writes(
+                client, recipe, author, tag, ingredients
+            )
+        ]
+        if not all(results):
+            raise CommandError(
+                f'Превышен бюджет SQL-запросов: {results.count(False)}'
+            )
+        self.stdout.write(self.style.SUCCESS('Бюджеты SQL-запросов соблюдены'))
@@ -0,0 +1,116 @@
+import os
+import time
+
+from django.db import connection
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Histogram, generate_latest)
+from prometheus_client.multiprocess import MultiProcessCollector
+
+LABELS = ('view', 'action', 'method')
+UNRESOLVED = '<unresolved>'
+
+REQUEST_DURATION = Histogram(
+    'foodgram_request_duration_seconds',
+    'Время обработки запроса',
+    LABELS
+)
+REQUEST_QUERIES = Histogram(
+    'foodgram_request_sql_queries',
+    'Количество SQL-запросов на запрос',
+    LABELS,
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, float('inf'))
+)
+REQUEST_SQL_DURATION = Histogram(
+    'foodgram_request_sql_duration_seconds',
+    'Суммарное время SQL-запросов на запрос',
+    LABELS
+)
+RESPONSE_SIZE = Histogram(
+    'foodgram_response_size_bytes',
+    'Размер ответа',
+    LABELS,
+    buckets=tuple(2 ** power for power in range(6, 24, 2)) + (float('inf'),)
+)
+
+
+class QueryStats:
+    '''Обёртка execute_wrapper для подсчёта SQL-запросов и их времени'''
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def get_view_labels(request):
+    '''Имя представления и действия вьюсета для меток метрик'''
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED, '', request.method
+    view = getattr(match.func, 'cls', match.func)
+    actions = getattr(match.func, 'actions', None) or {}
+    return (view.__name__, actions.get(request.method.lower(), ''),
+            request.method)
+
+
+def observe(labels, duration, stats, size):
+    '''Запись метрик одного запроса'''
+    REQUEST_DURATION.labels(*labels).observe(duration)
+    REQUEST_QUERIES.labels(*labels).observe(stats.count)
+    REQUEST_SQL_DURATION.labels(*labels).observe(stats.duration)
+    RESPONSE_SIZE.labels(*labels).observe(size)
+
+
+class MetricsMiddleware:
+    '''Сбор времени, SQL-запросов и размера ответа по представлениям'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        start = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        labels = get_view_labels(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                response.streaming_content, labels, start, stats
+            )
+        else:
+            observe(labels, time.perf_counter() - start, stats,
+                    len(response.content))
+        return response
+
+    @staticmethod
+    def stream(content, labels, start, stats):
+        '''Учёт потокового ответа после отдачи последнего фрагмента'''
+        size = 0
+        try:
+            with connection.execute_wrapper(stats):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            observe(labels, time.perf_counter() - start, stats, size)
+
+
+def get_registry():
+    '''Реестр метрик с учётом нескольких процессов gunicorn'''
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    '''Метрики в текстовом формате Prometheus'''
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
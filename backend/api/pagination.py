@@ -0,0 +1,158 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from api.cache import get_catalogue_version
+
+
+class PageLimitPagination(PageNumberPagination):
+    '''Постраничная пагинация с размером страницы из параметра limit'''
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+def get_planner_estimate(queryset):
+    '''Оценка количества строк планировщиком PostgreSQL'''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class ApproximatePage(Page):
+    '''Страница, наличие следующей страницы у которой известно без COUNT'''
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = has_next
+
+    def has_next(self):
+        return self.next_exists
+
+
+class ApproximateCountPaginator(Paginator):
+    '''Пагинатор с приблизительным количеством объектов на больших выборках'''
+
+    def __init__(self, *args, cache_count=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_count = cache_count
+
+    @cached_property
+    def count_info(self):
+        '''Точное количество на малых выборках, оценка на больших'''
+        queryset = self.object_list.order_by().values('pk')
+        signature = hashlib.md5(str(queryset.query).encode()).hexdigest()
+        model = self.object_list.model
+        exact_key = (f'pagination:count:{model._meta.label_lower}:'
+                     f'{get_catalogue_version(model)}:{signature}')
+        if self.cache_count:
+            count = cache.get(exact_key)
+            if count is not None:
+                return count, True
+        estimate_key = f'pagination:estimate:{signature}'
+        estimate = cache.get(estimate_key)
+        if estimate is not None:
+            return estimate, False
+        estimate = get_planner_estimate(queryset)
+        if (estimate is None
+                or estimate <= settings.PAGINATION_EXACT_COUNT_THRESHOLD):
+            count = queryset.count()
+            if self.cache_count:
+                cache.set(exact_key, count,
+                          settings.PAGINATION_EXACT_COUNT_CACHE_TIMEOUT)
+            return count, True
+        cache.set(estimate_key, estimate,
+                  settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return estimate, False
+
+    @property
+    def count(self):
+        return self.count_info[0]
+
+    @property
+    def count_exact(self):
+        return self.count_info[1]
+
+    def validate_number(self, number):
+        '''По оценке количества не отсекаем страницы за её пределами'''
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы должен быть целым числом')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
+
+    def page(self, number):
+        '''При оценке количества следующая страница ищется по лишней строке'''
+        if self.count_exact:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('На этой странице нет результатов')
+        return ApproximatePage(rows[:self.per_page], number, self,
+                               has_next=len(rows) > self.per_page)
+
+
+class ApproximateCountPagination(PageLimitPagination):
+    '''Постраничная пагинация без точного COUNT(*) на больших выборках'''
+    cache_count = False
+
+    def django_paginator_class(self, object_list, per_page):
+        return ApproximateCountPaginator(object_list, per_page,
+                                         cache_count=self.cache_count)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        '''Кэш точного количества только для параметров cached_list_params'''
+        self.cache_count = set(request.query_params) <= set(
+            getattr(view, 'cached_list_params', ())
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_exact'] = self.page.paginator.count_exact
+        return response
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Курсорная пагинация рецептов по дате публикации'''
+    ordering = ('-pub_date', 'id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class UserCursorPagination(CursorPagination):
+    '''Курсорная пагинация пользователей по id'''
+    ordering = ('id',)
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class CursorPaginationMixin:
+    '''Переключение на курсорную пагинацию при наличии параметра cursor'''
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if (self.cursor_pagination_class is not None
+                and not hasattr(self, '_paginator')
+                and 'cursor' in self.request.query_params):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
@@ -0,0 +1,166 @@
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.db import connection
+from django.db.models import Count
+
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAAD'
+    'UlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+# Бюджеты действий API: не зависят от числа строк в ответе
+READ_BUDGETS = {
+    'tags-list': 1,
+    'tags-detail': 1,
+    'ingredients-list': 1,
+    'ingredients-autocomplete': 1,
+    'ingredients-detail': 1,
+    'recipes-list': 7,
+    'recipes-detail': 4,
+    'recipes-cart-summary': 1,
+    'recipes-download-shopping-cart': 1,
+    'users-list': 3,
+    'users-detail': 2,
+    'users-me': 1,
+    'users-subscriptions': 3,
+}
+WRITE_BUDGETS = {
+    'POST recipes-favorite': 4,
+    'DELETE recipes-favorite': 3,
+    'POST recipes-shopping-cart': 10,
+    'DELETE recipes-shopping-cart': 9,
+    'POST recipes-favorite-bulk': 5,
+    'DELETE recipes-favorite-bulk': 4,
+    'POST recipes-shopping-cart-bulk': 11,
+    'DELETE recipes-shopping-cart-bulk': 10,
+    'POST users-subscribe': 5,
+    'DELETE users-subscribe': 3,
+    'POST users-subscribe-bulk': 5,
+    'DELETE users-subscribe-bulk': 4,
+    'POST recipes-list': 18,
+    'PATCH recipes-detail': 18,
+    'PATCH recipes-detail (remove ingredients)': 17,
+    'DELETE recipes-detail': 12,
+}
+PAGED = ('recipes-list', 'users-list', 'users-subscriptions')
+AUTHENTICATED_ONLY = ('users-me',)
+# Удаление ингридиентов из рецепта проверяется на двух ингридиентах
+INGREDIENTS = 2
+
+
+def get_reads(recipe, author, tag, ingredient):
+    '''Чтения с бюджетами: имя маршрута, аргументы и параметры запроса'''
+    return (
+        ('tags-list', (), {}),
+        ('tags-detail', (tag.id,), {}),
+        ('ingredients-list', (), {'name': ingredient.name[:3]}),
+        ('ingredients-autocomplete', (), {'name': ingredient.name[:3]}),
+        ('ingredients-detail', (ingredient.id,), {}),
+        ('recipes-list', (), {'tags': tag.slug}),
+        ('recipes-detail', (recipe.id,), {}),
+        ('recipes-cart-summary', (), {}),
+        ('recipes-download-shopping-cart', (), {}),
+        ('users-list', (), {}),
+        ('users-detail', (author.id,), {}),
+        ('users-me', (), {}),
+        ('users-subscriptions', (), {}),
+    )
+
+
+def get_seeded_objects(user_id=None):
+    '''Объекты заполненной базы для замеров: пользователь с самой большой
+    корзиной, чужой рецепт вне его избранного и корзины, автор без его
+    подписки, тэг и ингридиенты; None, если база не заполнена'''
+    users = User.objects.all()
+    if user_id is not None:
+        users = users.filter(id=user_id)
+    user = users.annotate(
+        carts=Count('shopping_cart')
+    ).order_by('-carts', 'id').first()
+    if user is None:
+        return None
+    recipe = Recipe.objects.exclude(author=user).exclude(
+        favorites__user=user
+    ).exclude(shopping_cart__user=user).order_by('-pub_date').first()
+    author = User.objects.exclude(id=user.id).exclude(
+        following__user=user
+    ).order_by('-followers_count', 'id').first()
+    tag = Tag.objects.order_by('id').first()
+    ingredients = list(Ingredient.objects.order_by('id')[:INGREDIENTS])
+    if None in (recipe, author, tag) or len(ingredients) < INGREDIENTS:
+        return None
+    return user, recipe, author, tag, ingredients
+
+
+def get_fingerprint(sql):
+    '''SQL без литералов и параметров для группировки одинаковых запросов'''
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def format_queries(queries):
+    '''Запросы, сгруппированные по отпечатку, самые частые первыми'''
+    fingerprints = Counter(get_fingerprint(sql) for sql in queries)
+    return '\n'.join(
+        f'{count} x {fingerprint}'
+        for fingerprint, count in fingerprints.most_common()
+    )
+
+
+class QueryBudgetExceeded(AssertionError):
+    '''Количество SQL-запросов превысило бюджет'''
+
+
+class QueryRecorder:
+    '''Обёртка execute_wrapper, запоминающая текст SQL-запросов'''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudget(ContextDecorator):
+    '''Проверка, что блок кода выполняет не больше limit SQL-запросов'''
+
+    def __init__(self, limit, name='', using=connection):
+        self.limit = limit
+        self.name = name
+        self.using = using
+        self.recorder = None
+        self.wrapper = None
+
+    @property
+    def queries(self):
+        return self.recorder.queries
+
+    def __enter__(self):
+        self.recorder = QueryRecorder()
+        self.wrapper = self.using.execute_wrapper(self.recorder)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wrapper.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None and len(self.queries) > self.limit:
+            raise QueryBudgetExceeded(
+                f'{self.name or "Блок"}: {len(self.queries)} SQL-запросов '
+                f'при бюджете {self.limit}\n{format_queries(self.queries)}'
+            )
+        return False
@@ -1,21 +1,134 @@
 import base64
-
-from django.core.files.base import ContentFile
+import binascii
+import hashlib
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer as DjoserUserSerializer
+from PIL import Image
 from rest_framework import serializers
 
-from recipes.models import Ingredient, IngredientsInRecipe, Recipe, Tag
-from users.models import Subscribe, User
+from jobs.registry import enqueue
+from recipes.cart import enqueue_recipe_refresh
+from recipes.images import get_missing_variants, get_variant_url
+from recipes.models import (CartIngredient, Ingredient, IngredientsInRecipe,
+                            Recipe, Tag)
+from users.models import User
+
+BASE64_MARKER = ';base64,'
+NON_BASE64_ALPHABET = re.compile(r'[^A-Za-z0-9+/=]')
 
 
 class Base64ImageField(serializers.ImageField):
     '''Сериализатор для кодировки изображения base64'''
+    chunk_size = 64 * 1024
+
+    def __init__(self, *args, thumbnail=False, thumbnail_in_list=False,
+                 **kwargs):
+        self.thumbnail = thumbnail
+        self.thumbnail_in_list = thumbnail_in_list
+        super().__init__(*args, **kwargs)
+
+    def decode(self, imgstr, ext):
+        '''Декодирование по частям с подсчётом хэша содержимого'''
+        # до очистки длину ограничиваем с запасом на переводы строк MIME
+        if len(imgstr) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES * 2:
+            self.fail_size()
+        imgstr = NON_BASE64_ALPHABET.sub('', imgstr)
+        if len(imgstr) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES:
+            self.fail_size()
+        content = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        digest = hashlib.sha256()
+        try:
+            for start in range(0, len(imgstr), self.chunk_size):
+                chunk = base64.b64decode(
+                    imgstr[start:start + self.chunk_size]
+                )
+                digest.update(chunk)
+                content.write(chunk)
+        except (binascii.Error, ValueError):
+            raise serializers.ValidationError(
+                'Некорректное изображение в формате base64')
+        content.seek(0)
+        return File(content, name=f'{digest.hexdigest()}.{ext}')
+
+    @staticmethod
+    def fail_size():
+        '''Ошибка превышения размера изображения'''
+        raise serializers.ValidationError(
+            'Размер изображения не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_BYTES} байт')
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            format, separator, imgstr = data.partition(BASE64_MARKER)
+            if not separator or BASE64_MARKER in imgstr:
+                raise serializers.ValidationError(
+                    'Некорректное изображение в формате base64')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
-        return super().to_internal_value(data)
+            data = self.decode(imgstr, ext)
+        data = super().to_internal_value(data)
+        width, height = Image.open(data).size
+        data.seek(0)
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                'Разрешение изображения не должно превышать '
+                f'{settings.RECIPE_IMAGE_MAX_PIXELS} пикселей')
+        return data
+
+    def use_thumbnail(self):
+        '''Отдавать ли уменьшенную копию вместо оригинала'''
+        view = self.context.get('view')
+        return self.thumbnail or (
+            self.thumbnail_in_list and getattr(view, 'action', None) == 'list'
+        )
+
+    def to_representation(self, value):
+        if not value or not self.use_thumbnail():
+            return super().to_representation(value)
+        url = get_variant_url(value)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    '''Список связанных объектов, выбираемых одним запросом id__in'''
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        ids = []
+        for pk in data:
+            try:
+                ids.append(int(pk))
+            except (TypeError, ValueError):
+                self.child_relation.fail('incorrect_type',
+                                         data_type=type(pk).__name__)
+        objects = self.child_relation.get_queryset().in_bulk(ids)
+        for pk in ids:
+            if pk not in objects:
+                self.child_relation.fail('does_not_exist', pk_value=pk)
+        return [objects[pk] for pk in ids]
+
+
+def get_subscriptions(request):
+    '''Id авторов, на которых подписан пользователь, на весь запрос'''
+    if request is None or request.user.is_anonymous:
+        return frozenset()
+    if not hasattr(request, '_subscriptions'):
+        request._subscriptions = frozenset(
+            request.user.follower.values_list('author_id', flat=True)
+        )
+    return request._subscriptions
 
 
 class UserSerializer(DjoserUserSerializer):
@@ -27,10 +140,11 @@ class UserSerializer(DjoserUserSerializer):
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
                   'is_subscribed')
 
+    def get_subscriptions(self):
+        return get_subscriptions(self.context.get('request'))
+
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return (user.follower.filter(author=obj).exists()
-                and user.is_authenticated)
+        return obj.id in self.get_subscriptions()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -49,7 +163,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class IngredientsInRecipeSerializer(serializers.ModelSerializer):
     '''Сериализатор модели Ingredient в рецептах'''
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     name = serializers.CharField(source='ingredient.name', read_only=True)
     measurement_unit = serializers.CharField(
         source='ingredient.measurement_unit',
@@ -67,6 +181,20 @@ class IngredientsInRecipeSerializer(serializers.ModelSerializer):
         return data
 
 
+class CartIngredientSerializer(serializers.ModelSerializer):
+    '''Сериализатор суммарных ингридиентов корзины'''
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+    amount = serializers.ReadOnlyField(source='total_amount')
+
+    class Meta:
+        model = CartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
 class RecipeReadSerializer(serializers.ModelSerializer):
     '''Сериализатор для чтения рецептов'''
     tags = TagSerializer(many=True, read_only=True)
@@ -76,7 +204,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField()
+    image = Base64ImageField(thumbnail_in_list=True)
 
     class Meta:
         model = Recipe
@@ -86,24 +214,73 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
     def get_is_favorited(self, obj):
         '''Метод для избранного'''
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
-        return (Recipe.objects.filter(
-            favorites__user=user, id=obj.id).exists()
-            and user.is_authenticated)
+        return (user.is_authenticated
+                and obj.favorites.filter(user=user).exists())
 
     def get_is_in_shopping_cart(self, obj):
         '''Метод для корзины'''
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
-        return (Recipe.objects.filter(shopping_cart__user=user,
-                id=obj.id).exists() and user.is_authenticated)
+        return (user.is_authenticated
+                and obj.shopping_cart.filter(user=user).exists())
+
+
+class RecipeFastReadSerializer(serializers.BaseSerializer):
+    '''Чтение рецептов словарями из предзагруженных строк без полей DRF'''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.image = Base64ImageField(thumbnail_in_list=True)
+        self.image.bind('image', self)
+
+    def to_representation(self, instance):
+        author = instance.author
+        return {
+            'id': instance.id,
+            'tags': [
+                {'id': tag.id, 'name': tag.name, 'color': tag.color,
+                 'slug': tag.slug}
+                for tag in instance.tags.all()
+            ],
+            'author': {
+                'email': author.email,
+                'id': author.id,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': author.id in get_subscriptions(
+                    self.context.get('request')
+                ),
+            },
+            'ingredients': [
+                {'id': item.ingredient.id, 'name': item.ingredient.name,
+                 'measurement_unit': item.ingredient.measurement_unit,
+                 'amount': item.amount}
+                for item in instance.ingredientsinrecipe_set.all()
+            ],
+            'is_favorited': instance.is_favorited,
+            'is_in_shopping_cart': instance.is_in_shopping_cart,
+            'name': instance.name,
+            'image': self.image.to_representation(instance.image),
+            'text': instance.text,
+            'cooking_time': instance.cooking_time,
+        }
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     '''Сериализатор для создания нового рецепта'''
     image = Base64ImageField()
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
+    tags = BulkManyRelatedField(
+        child_relation=serializers.PrimaryKeyRelatedField(
+            queryset=Tag.objects.all(),
+            error_messages={
+                'does_not_exist': 'Тэг отсутствует в базе данных'
+            }
+        )
     )
     author = UserSerializer(read_only=True)
     ingredients = IngredientsInRecipeSerializer(
@@ -127,47 +304,77 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         ]
         IngredientsInRecipe.objects.bulk_create(ingredients_list)
 
+    def enqueue_variants(self, recipe):
+        '''Постановка в очередь создания уменьшенных копий изображения;
+        копии уже загруженного ранее изображения не создаются повторно'''
+        if not get_missing_variants(recipe.image):
+            return
+        enqueue('recipes.create_variants', {'name': recipe.image.name},
+                key=f'variants:{recipe.image.name}')
+
+    def ingredients_update(self, ingredients, recipe):
+        '''Метод для изменения только отличающихся ингридиентов'''
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredientsinrecipe_set.all()
+        }
+        new_ingredients = []
+        changed = []
+        for ingredient in ingredients:
+            item = current.pop(ingredient['id'].id, None)
+            if item is None:
+                new_ingredients.append(ingredient)
+            elif item.amount != ingredient['amount']:
+                item.amount = ingredient['amount']
+                changed.append(item)
+        if current:
+            IngredientsInRecipe.objects.filter(
+                id__in=[item.id for item in current.values()]
+            ).delete()
+        IngredientsInRecipe.objects.bulk_update(changed, ('amount',))
+        self.ingredients_create(ingredients=new_ingredients, recipe=recipe)
+        enqueue_recipe_refresh(
+            [recipe.id],
+            ingredient_ids=list(current)
+            + [item.ingredient_id for item in changed]
+            + [ingredient['id'].id for ingredient in new_ingredients]
+        )
+
     def validate_ingredients(self, data):
-        """Валидация ингридиентов (наличие, уникальность,, количество)"""
-        ingredients = self.initial_data.get('ingredients')
-        if not ingredients:
+        """Валидация ингридиентов (наличие, уникальность)"""
+        if not data:
             raise serializers.ValidationError(
                 'Добавьте хотя бы один ингредиент в рецепт!')
-        ingredients_list = []
-        for ingredient in ingredients:
-            check_id = ingredient['id']
-            check_ingredient = Ingredient.objects.filter(id=check_id)
-            if not check_ingredient.exists():
-                raise serializers.ValidationError(
-                    'Данного продукта нет в базе!')
-            if check_id in ingredients_list:
-                raise serializers.ValidationError('Ингридиенты должны '
-                                                  'быть уникальными')
-            try:
-                if int(ingredient.get('amount')) <= 0:
-                    raise serializers.ValidationError(
-                        'Количество должно быть положительным!')
-            except Exception:
-                raise serializers.ValidationError({'amount': 'Колличество'
-                                                   'должно быть числом'})
-            ingredients_list.append(check_id)
+        ids = [ingredient['id'] for ingredient in data]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError('Ингридиенты должны '
+                                              'быть уникальными')
+        ingredients = Ingredient.objects.in_bulk(ids)
+        if len(ingredients) != len(ids):
+            raise serializers.ValidationError(
+                'Данного продукта нет в базе!')
+        for ingredient in data:
+            ingredient['id'] = ingredients[ingredient['id']]
         return data
 
     def validate_tags(self, data):
         """Валидация тэгов (наличие, уникальность)"""
-        tags = self.initial_data.get('tags')
-        if not tags:
+        if not data:
             raise serializers.ValidationError(
                 'Рецепт не может быть без тегов')
-        for tag_id in tags:
-            if not Tag.objects.filter(id=tag_id).exists():
-                raise serializers.ValidationError(
-                    'Тэг отсутствует в базе данных')
-        tags_bd = set(tags)
-        if len(tags) != len(tags_bd):
+        if len(data) != len(set(data)):
             raise serializers.ValidationError('Теги не должны повторяться')
         return data
 
+    def to_representation(self, instance):
+        '''Ответ с ингридиентами рецепта одним запросом'''
+        prefetch_related_objects([instance], Prefetch(
+            'ingredientsinrecipe_set',
+            queryset=IngredientsInRecipe.objects.select_related('ingredient')
+        ))
+        return super().to_representation(instance)
+
+    @transaction.atomic
     def create(self, validated_data):
         '''Метод для создания рецепта'''
         ingredients = validated_data.pop('ingredientsinrecipe_set')
@@ -178,24 +385,30 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             ingredients=ingredients,
             recipe=recipe
         )
+        self.enqueue_variants(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         '''Метод для редактирования рецепта'''
-        IngredientsInRecipe.objects.filter(recipe=instance).delete()
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredientsinrecipe_set')
-        instance.tags.set(tags)
-        self.ingredients_create(
-            ingredients=ingredients,
-            recipe=instance
-        )
-        return super().update(instance=instance, validated_data=validated_data)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredientsinrecipe_set', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            self.ingredients_update(
+                ingredients=ingredients,
+                recipe=instance
+            )
+        instance = super().update(instance=instance,
+                                  validated_data=validated_data)
+        self.enqueue_variants(instance)
+        return instance
 
 
 class RecipeSubscribesSerializer(serializers.ModelSerializer):
     '''Сериализатор добавление рецепта в избранное'''
-    image = Base64ImageField()
+    image = Base64ImageField(thumbnail=True)
 
     class Meta:
         model = Recipe
@@ -212,7 +425,7 @@ class SubscribeSerializer(UserSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='author.recipes.count')
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
 
     class Meta:
         model = User
@@ -221,27 +434,37 @@ class SubscribeSerializer(UserSerializer):
 
     def get_is_subscribed(self, obj):
         '''Метод получения наличия подписки'''
-        return Subscribe.objects.filter(
-            user=obj.user, author=obj.author
-        ).exists()
+        return True
 
     def get_recipes(self, obj):
         '''Метод получения рецептов автора'''
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj.author, 'recipes_preview'):
+            queryset = obj.author.recipes_preview
+        else:
+            request = self.context.get('request')
+            limit = request.GET.get('recipes_limit')
+            queryset = Recipe.objects.filter(author=obj.author)
+            if limit and limit.isdigit():
+                queryset = queryset[:int(limit)]
         return RecipeSubscribesSerializer(queryset, many=True).data
 
 
 class FavoriteCartSerializer(serializers.ModelSerializer):
     '''Сериализатор для избранного'''
     name = serializers.ReadOnlyField(source='recipe.name')
-    image = Base64ImageField(source='recipe.image')
+    image = Base64ImageField(source='recipe.image', thumbnail=True)
     cooking_time = serializers.ReadOnlyField(source='recipe.cooking_time')
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    '''Сериализатор списка id для массовых операций'''
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_IDS
+    )
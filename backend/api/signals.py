@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.cache import bump_catalogue_version
+from recipes.models import Ingredient, IngredientsInRecipe, Recipe, Tag
+from users.models import User
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_catalogue(sender, **kwargs):
+    '''Сброс кэша справочников после фиксации транзакции'''
+    transaction.on_commit(lambda: bump_catalogue_version(sender))
+
+
+def invalidate_recipe_list():
+    '''Сброс кэша списка рецептов после фиксации транзакции'''
+    transaction.on_commit(lambda: bump_catalogue_version(Recipe))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientsInRecipe)
+@receiver(post_delete, sender=IngredientsInRecipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_recipes(sender, **kwargs):
+    '''Сброс кэша списка рецептов при изменении рецептов и справочников'''
+    invalidate_recipe_list()
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipes_on_author_change(sender, update_fields=None,
+                                        **kwargs):
+    '''Сброс кэша списка рецептов при изменении данных автора'''
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        invalidate_recipe_list()
@@ -0,0 +1,649 @@
+import json
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings, skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.cache import bump_catalogue_version
+from api.query_budget import (AUTHENTICATED_ONLY, PAGED, PNG, READ_BUDGETS,
+                              WRITE_BUDGETS, QueryBudget, get_reads)
+from api.serializers import (Base64ImageField, RecipeFastReadSerializer,
+                             RecipeReadSerializer)
+from api.views import RecipeViewSet
+from jobs.models import Job
+from recipes.cart import rebuild_carts
+from recipes.counters import recount
+from recipes.images import create_variants
+from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'versions',
+    },
+}
+THREADS = 8
+ANONYMOUS_FORBIDDEN = ('recipes-cart-summary',
+                       'recipes-download-shopping-cart',
+                       'users-subscriptions')
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', password='password',
+        first_name='Имя', last_name='Фамилия'
+    )
+
+
+def create_fixtures(rows):
+    '''rows авторов по rows рецептов, у каждого рецепта rows тэгов и
+    ингридиентов; пользователь подписан на всех авторов, а первые rows
+    рецептов у него в избранном и в корзине'''
+    user = create_user('user')
+    authors = [create_user(f'author{number}') for number in range(rows)]
+    tags = [Tag.objects.create(name=f'Тэг {number}', color=f'#{number:06x}',
+                               slug=f'tag-{number}')
+            for number in range(rows)]
+    ingredients = [Ingredient.objects.create(name=f'Ингридиент {number}',
+                                             measurement_unit='г')
+                   for number in range(rows)]
+    Recipe.objects.bulk_create([
+        Recipe(author=author, name=f'Рецепт {number}', text='Текст',
+               image='recipes/test.png', cooking_time=10)
+        for author in authors
+        for number in range(rows)
+    ])
+    recipes = list(Recipe.objects.order_by('id'))
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in tags
+    ])
+    IngredientsInRecipe.objects.bulk_create([
+        IngredientsInRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+        for recipe in recipes
+        for ingredient in ingredients
+    ])
+    Subscribe.objects.bulk_create([
+        Subscribe(user=user, author=author) for author in authors
+    ])
+    for model in (Favorite, ShoppingCart):
+        model.objects.bulk_create([
+            model(user=user, recipe=recipe) for recipe in recipes[:rows]
+        ])
+    author = create_user('author')
+    recipe = Recipe.objects.create(author=author, name='Новый рецепт',
+                                   text='Текст', image='recipes/test.png',
+                                   cooking_time=10)
+    recount()
+    rebuild_carts()
+    return user, author, recipe, tags, ingredients
+
+
+class QueryBudgetMixin:
+    '''Проверка бюджета SQL-запросов одного действия с холодным кэшем'''
+    rows = 1
+
+    def assert_budget(self, name, budget, request, status_code):
+        cache.clear()
+        with QueryBudget(budget, f'{name} rows={self.rows}'):
+            response = request()
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status_code, name)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReadQueryBudgetTests(QueryBudgetMixin, TestCase):
+    '''Бюджеты чтения не зависят от числа строк в ответе'''
+
+    @classmethod
+    def setUpTestData(cls):
+        (cls.user, cls.author, cls.recipe, tags,
+         ingredients) = create_fixtures(cls.rows)
+        cls.reads = get_reads(cls.recipe, cls.author, tags[0],
+                              ingredients[0])
+
+    def check_reads(self, client, anonymous):
+        for name, args, params in self.reads:
+            if anonymous and name in AUTHENTICATED_ONLY:
+                continue
+            query = dict(params)
+            if name in PAGED:
+                query.update(limit=self.rows, recipes_limit=self.rows)
+            status_code = 200
+            if anonymous and name in ANONYMOUS_FORBIDDEN:
+                status_code = 401
+            with self.subTest(name=name, anonymous=anonymous):
+                self.assert_budget(
+                    name, READ_BUDGETS[name],
+                    lambda: client.get(reverse(f'api:{name}', args=args),
+                                       query),
+                    status_code
+                )
+
+    def test_anonymous_reads(self):
+        self.check_reads(APIClient(), anonymous=True)
+
+    def test_authenticated_reads(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.check_reads(client, anonymous=False)
+
+
+class ManyRowsReadQueryBudgetTests(ReadQueryBudgetTests):
+    rows = 20
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WriteQueryBudgetTests(QueryBudgetMixin, TransactionTestCase):
+    '''Бюджеты записи с фиксацией транзакций и отложенными пересчётами'''
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        (self.user, self.author, self.recipe, self.tags,
+         self.ingredients) = create_fixtures(self.rows)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_toggles(self):
+        bulk = {'ids': [self.recipe.id]}
+        for name, args, data, statuses in (
+            ('recipes-favorite', (self.recipe.id,), None, (201, 204)),
+            ('recipes-shopping-cart', (self.recipe.id,), None, (201, 204)),
+            ('recipes-favorite-bulk', (), bulk, (200, 200)),
+            ('recipes-shopping-cart-bulk', (), bulk, (200, 200)),
+            ('users-subscribe', (self.author.id,), None, (201, 204)),
+            ('users-subscribe-bulk', (), {'ids': [self.author.id]},
+             (200, 200)),
+        ):
+            url = reverse(f'api:{name}', args=args)
+            for method, status_code in zip(
+                (self.client.post, self.client.delete), statuses
+            ):
+                action = f'{method.__name__.upper()} {name}'
+                with self.subTest(action=action):
+                    self.assert_budget(
+                        action, WRITE_BUDGETS[action],
+                        lambda: method(url, data, format='json'),
+                        status_code
+                    )
+
+    def test_recipe_writes(self):
+        removed = [Ingredient.objects.create(name=f'Лишний {number}',
+                                             measurement_unit='г')
+                   for number in range(2)]
+        data = {
+            'ingredients': [{'id': ingredient.id, 'amount': 10}
+                            for ingredient in self.ingredients + removed],
+            'tags': [tag.id for tag in self.tags], 'image': PNG,
+            'name': 'Бюджет запросов', 'text': 'Бюджет запросов',
+            'cooking_time': 10,
+        }
+        created = {}
+
+        def create():
+            response = self.client.post(reverse('api:recipes-list'), data,
+                                        format='json')
+            created['id'] = response.data['id']
+            created['url'] = reverse('api:recipes-detail',
+                                     args=(created['id'],))
+            return response
+
+        self.assert_budget('POST recipes-list',
+                           WRITE_BUDGETS['POST recipes-list'], create, 201)
+        self.assert_budget(
+            'PATCH recipes-detail', WRITE_BUDGETS['PATCH recipes-detail'],
+            lambda: self.client.patch(created['url'], data, format='json'),
+            200
+        )
+        ShoppingCart.objects.create(user=self.user,
+                                    recipe_id=created['id'])
+        action = 'PATCH recipes-detail (remove ingredients)'
+        self.assert_budget(
+            action, WRITE_BUDGETS[action],
+            lambda: self.client.patch(created['url'], {
+                'ingredients': data['ingredients'][:-len(removed)]
+            }, format='json'),
+            200
+        )
+        self.assertEqual(
+            IngredientsInRecipe.objects.filter(
+                recipe_id=created['id'], ingredient__in=removed
+            ).count(),
+            0
+        )
+        self.assert_budget(
+            'DELETE recipes-detail', WRITE_BUDGETS['DELETE recipes-detail'],
+            lambda: self.client.delete(created['url']), 204
+        )
+
+    def test_reuploaded_image(self):
+        data = {
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 10}],
+            'tags': [self.tags[0].id], 'image': PNG, 'name': 'Повтор',
+            'text': 'Повтор', 'cooking_time': 10,
+        }
+        url = reverse('api:recipes-list')
+        self.client.post(url, data, format='json')
+        call_command('run_workers', '--once', stdout=StringIO())
+        self.assert_budget(
+            'POST recipes-list', WRITE_BUDGETS['POST recipes-list'],
+            lambda: self.client.post(url, data, format='json'), 201
+        )
+        self.assertEqual(
+            Job.objects.filter(name='recipes.create_variants').count(), 1
+        )
+
+    def test_check_query_budgets_command(self):
+        Ingredient.objects.create(name='Лишний', measurement_unit='г')
+        out = StringIO()
+        call_command('check_query_budgets', stdout=out)
+        self.assertIn('PATCH recipes-detail (remove ingredients)',
+                      out.getvalue())
+
+
+class ManyRowsWriteQueryBudgetTests(WriteQueryBudgetTests):
+    rows = 20
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeListQueryTests(TestCase):
+    '''Число запросов списка рецептов не растёт с размером страницы'''
+    rows = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, _, cls.recipe, _, _ = create_fixtures(cls.rows)
+        newest = list(Recipe.objects.order_by('-pub_date')[:cls.rows])
+        for model, step in ((Favorite, 2), (ShoppingCart, 3)):
+            model.objects.bulk_create([
+                model(user=cls.user, recipe=recipe)
+                for recipe in newest[::step]
+            ], ignore_conflicts=True)
+
+    def get_list(self, client, limit):
+        '''Список рецептов и число выполненных SQL-запросов'''
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('api:recipes-list'),
+                                  {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], len(queries)
+
+    def test_flags_do_not_add_queries(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        _, one_row_queries = self.get_list(client, 1)
+        results, queries = self.get_list(client, self.rows)
+        self.assertEqual(queries, one_row_queries)
+        favorites = set(self.user.favorites.values_list('recipe_id',
+                                                        flat=True))
+        carts = set(self.user.shopping_cart.values_list('recipe_id',
+                                                        flat=True))
+        self.assertTrue(any(recipe['is_favorited'] for recipe in results))
+        for recipe in results:
+            self.assertEqual(recipe['is_favorited'], recipe['id'] in favorites)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in carts)
+
+    def test_nested_data_does_not_add_queries(self):
+        client = APIClient()
+        _, one_row_queries = self.get_list(client, 1)
+        results, queries = self.get_list(client, self.rows)
+        self.assertEqual(queries, one_row_queries)
+        self.assertEqual(len(results), self.rows)
+        for recipe in results:
+            if recipe['id'] == self.recipe.id:
+                continue
+            self.assertEqual(len(recipe['tags']), self.rows)
+            self.assertEqual(len(recipe['ingredients']), self.rows)
+            self.assertTrue(recipe['author']['username'])
+
+
+class RecipeSerializerParityTests(TestCase):
+    '''Быстрый сериализатор рецептов отдаёт тот же JSON, что и DRF'''
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author, _, _, _ = create_fixtures(2)
+        Recipe.objects.create(author=cls.author, name='Без изображения',
+                              text='Текст', image='', cooking_time=10)
+        Recipe.objects.create(author=cls.user, name='Без тэгов',
+                              text='Текст', image='recipes/test.png',
+                              cooking_time=10)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = self.settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        recipe = Recipe.objects.create(
+            author=self.author, name='С уменьшенными копиями', text='Текст',
+            image=Base64ImageField().to_internal_value(PNG), cooking_time=10
+        )
+        create_variants(recipe.image)
+
+    def render(self, serializer_class, user, action, many):
+        '''JSON рецептов из аннотированного queryset вьюсета'''
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(request=request, action=action,
+                             format_kwarg=None, args=(), kwargs={})
+        recipes = view.get_queryset().order_by('id')
+        context = {'request': request, 'view': view, 'format': None}
+        if not many:
+            return [JSONRenderer().render(serializer_class(
+                recipe, context=context
+            ).data) for recipe in recipes]
+        return JSONRenderer().render(
+            serializer_class(recipes, many=True, context=context).data
+        )
+
+    def test_same_json(self):
+        for user in (AnonymousUser(), self.user):
+            for action, many in (('list', True), ('retrieve', False)):
+                with self.subTest(user=user, action=action):
+                    fast, drf = (
+                        self.render(serializer_class, user, action, many)
+                        for serializer_class in (RecipeFastReadSerializer,
+                                                 RecipeReadSerializer)
+                    )
+                    self.assertEqual(fast, drf)
+
+    def test_flags_and_images_are_covered(self):
+        data = json.loads(self.render(RecipeFastReadSerializer, self.user,
+                                      'list', True))
+        self.assertTrue(any(recipe['is_favorited'] for recipe in data))
+        self.assertTrue(any(recipe['is_in_shopping_cart'] for recipe in data))
+        self.assertTrue(any(recipe['author']['is_subscribed']
+                            for recipe in data))
+        images = [recipe['image'] for recipe in data]
+        self.assertIn(None, images)
+        self.assertTrue(any('/variants/' in image for image in images
+                            if image))
+        self.assertTrue(any(image.endswith('test.png') for image in images
+                            if image))
+
+
+class AnonymousToggleTests(TestCase):
+    '''Анонимные переключения отклоняются с 401, а не падают с 500'''
+
+    @classmethod
+    def setUpTestData(cls):
+        _, cls.author, cls.recipe, _, _ = create_fixtures(1)
+
+    def test_toggles(self):
+        client = APIClient()
+        for name, args in (
+            ('recipes-favorite', (self.recipe.id,)),
+            ('recipes-shopping-cart', (self.recipe.id,)),
+            ('recipes-favorite-bulk', ()),
+            ('recipes-shopping-cart-bulk', ()),
+            ('users-subscribe', (self.author.id,)),
+            ('users-subscribe-bulk', ()),
+        ):
+            url = reverse(f'api:{name}', args=args)
+            for method in (client.post, client.delete):
+                with self.subTest(name=name, method=method.__name__):
+                    response = method(url, {'ids': [self.recipe.id]},
+                                      format='json')
+                    self.assertEqual(response.status_code, 401)
+
+
+@override_settings(CACHES=LOCMEM_CACHES,
+                   PAGINATION_EXACT_COUNT_THRESHOLD=0)
+class ApproximateCountPaginationTests(TestCase):
+    '''Заниженная оценка количества не теряет существующие страницы'''
+
+    @classmethod
+    def setUpTestData(cls):
+        create_fixtures(2)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('api:recipes-list')
+
+    def test_underestimated_count(self):
+        total = Recipe.objects.count()
+        with patch('api.pagination.get_planner_estimate', return_value=1):
+            for page in range(1, total + 1):
+                with self.subTest(page=page):
+                    response = self.client.get(self.url,
+                                               {'limit': 1, 'page': page})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertFalse(response.data['count_exact'])
+                    self.assertEqual(len(response.data['results']), 1)
+                    self.assertEqual(response.data['next'] is None,
+                                     page == total)
+            response = self.client.get(self.url,
+                                       {'limit': 1, 'page': total + 1})
+            self.assertEqual(response.status_code, 404)
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=10000)
+    def test_exact_count_is_cached_per_version(self):
+        total = Recipe.objects.count()
+        self.client.get(self.url, {'limit': 1})
+        with CaptureQueriesContext(connection) as cached:
+            response = self.client.get(self.url, {'limit': 1, 'page': 2})
+        self.assertEqual(response.data['count'], total)
+        self.assertFalse(any('COUNT' in query['sql']
+                             for query in cached.captured_queries))
+        bump_catalogue_version(Recipe)
+        with CaptureQueriesContext(connection) as bumped:
+            self.client.get(self.url, {'limit': 1})
+        self.assertTrue(any('COUNT' in query['sql']
+                            for query in bumped.captured_queries))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CatalogueCacheTests(TestCase):
+    '''Версия справочника переживает очистку кэша ответов'''
+
+    def test_etag(self):
+        client = APIClient()
+        url = reverse('api:tags-list')
+        etag = client.get(url)['ETag']
+        self.assertFalse(client.get(url).has_header('Last-Modified'))
+        cache.clear()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        for _ in range(2):
+            bump_catalogue_version(Tag)
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+    def test_autocomplete_caches_short_prefixes(self):
+        Ingredient.objects.create(name='Figs', measurement_unit='г')
+        client = APIClient()
+        url = reverse('api:ingredients-autocomplete')
+        for name, queries in (('Fi', 0), ('Fig', 1)):
+            client.get(url, {'name': name})
+            with self.subTest(name=name), self.assertNumQueries(queries):
+                response = client.get(url, {'name': name})
+            self.assertEqual(response.data[0]['name'], 'Figs')
+
+
+class CounterTests(TestCase):
+    '''Удаление пользователя пересчитывает счётчики, которых он касался'''
+
+    def test_user_deletion(self):
+        user, _, _, _, _ = create_fixtures(2)
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.delete(reverse('api:users-me'),
+                                 {'current_password': 'password'},
+                                 format='json')
+        self.assertEqual(response.status_code, 204)
+        for recipe in Recipe.objects.all():
+            self.assertEqual(recipe.favorites_count,
+                             recipe.favorites.count())
+            self.assertEqual(recipe.in_carts_count,
+                             recipe.shopping_cart.count())
+        for author in User.objects.all():
+            self.assertEqual(author.followers_count,
+                             author.following.count())
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+    '''Некорректные изображения base64 дают ошибку валидации, а не 500'''
+
+    def test_invalid_images(self):
+        marker = ';base64,'
+        for data in (
+            'data:image/png,AAAA',
+            PNG + marker + 'AAAA',
+            'data:image/png;base64,' + 'A' * 8 * 10 ** 6,
+            'data:image/png;base64,' + '\n' * 15 * 10 ** 6,
+        ):
+            with self.subTest(data=data[:40]):
+                with self.assertRaises(ValidationError):
+                    Base64ImageField().to_internal_value(data)
+
+    def test_valid_image(self):
+        image = Base64ImageField().to_internal_value(PNG)
+        self.assertTrue(image.name.endswith('.png'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CartRefreshJobTests(TransactionTestCase):
+    '''Корзины с изменённым рецептом пересчитываются фоновой задачей'''
+
+    def setUp(self):
+        self.user, _, _, _, _ = create_fixtures(2)
+        self.recipe = self.user.shopping_cart.first().recipe
+        self.client = APIClient()
+        self.client.force_authenticate(self.recipe.author)
+        self.url = reverse('api:recipes-detail', args=(self.recipe.id,))
+
+    def get_cart(self):
+        return dict(self.user.cart_ingredients.values_list('ingredient_id',
+                                                           'total_amount'))
+
+    def assert_cart_refreshed(self):
+        call_command('run_workers', '--once', '--workers', '1',
+                     stdout=StringIO())
+        self.assertEqual(self.get_cart(), dict(
+            IngredientsInRecipe.objects.filter(
+                recipe__shopping_cart__user=self.user
+            ).values_list('ingredient_id').annotate(total=Sum('amount'))
+        ))
+
+    def test_edit_and_delete(self):
+        ingredients = list(self.recipe.ingredientsinrecipe_set.all())
+        cart = self.get_cart()
+        response = self.client.patch(self.url, {'ingredients': [
+            {'id': ingredients[0].ingredient_id, 'amount': 1000}
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_cart(), cart)
+        self.assert_cart_refreshed()
+        self.assertNotEqual(self.get_cart(), cart)
+        self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assert_cart_refreshed()
+
+
+@skipUnlessDBFeature('has_select_for_update')
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConcurrentToggleTests(TransactionTestCase):
+    '''Параллельные одинаковые переключения меняют данные ровно один раз'''
+
+    def setUp(self):
+        self.user, self.author, self.recipe, _, _ = create_fixtures(1)
+
+    def run_parallel(self, method, url):
+        '''Статусы ответов THREADS одновременных одинаковых запросов'''
+        barrier = threading.Barrier(THREADS)
+        statuses = []
+
+        def request():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                statuses.append(getattr(client, method)(url).status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def assert_toggle(self, url, check):
+        for method, status_code in (('post', 201), ('delete', 204)):
+            with self.subTest(url=url, method=method):
+                self.assertEqual(self.run_parallel(method, url),
+                                 [status_code] + [400] * (THREADS - 1))
+                check()
+
+    def check_recipe_counters(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count,
+                         Favorite.objects.filter(recipe=self.recipe).count())
+        self.assertEqual(self.recipe.in_carts_count,
+                         ShoppingCart.objects.filter(
+                             recipe=self.recipe).count())
+
+    def check_cart(self):
+        self.check_recipe_counters()
+        self.assertEqual(
+            dict(self.user.cart_ingredients.values_list('ingredient_id',
+                                                        'total_amount')),
+            dict(IngredientsInRecipe.objects.filter(
+                recipe__shopping_cart__user=self.user
+            ).values_list('ingredient_id').annotate(total=Sum('amount')))
+        )
+
+    def check_followers(self):
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count,
+                         Subscribe.objects.filter(author=self.author).count())
+
+    def test_favorite(self):
+        self.assert_toggle(
+            reverse('api:recipes-favorite', args=(self.recipe.id,)),
+            self.check_recipe_counters
+        )
+
+    def test_shopping_cart(self):
+        self.assert_toggle(
+            reverse('api:recipes-shopping-cart', args=(self.recipe.id,)),
+            self.check_cart
+        )
+
+    def test_subscribe(self):
+        self.assert_toggle(
+            reverse('api:users-subscribe', args=(self.author.id,)),
+            self.check_followers
+        )
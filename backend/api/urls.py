@@ -1,8 +1,8 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientViewSet, RecipeViewSet, TagsViewSet,
-                       UserViewSet)
+from api.views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                       TagsViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -15,4 +15,5 @@ router.register('users', UserViewSet, basename='users')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,22 +1,84 @@
-from django.http import HttpResponse
+import csv
+import json
 
+from django.http import StreamingHttpResponse
+from rest_framework.response import Response
 
-def get_shopping_list(ingredient_list):
+from api.serializers import BulkIdsSerializer
+
+SHOPPING_LIST_TITLE = 'Список покупок'
+
+
+class Echo:
+    '''Буфер для csv.writer, возвращающий записанную строку'''
+    def write(self, value):
+        return value
+
+
+def shopping_list_txt(ingredients):
+    '''Построчный вывод списка покупок в текстовом формате'''
+    yield f'{SHOPPING_LIST_TITLE}\n\n'
+    for name, measurement_unit, amount in ingredients:
+        yield f'{name} - {amount} {measurement_unit}\n'
+
+
+def shopping_list_csv(ingredients):
+    '''Построчный вывод списка покупок в формате csv'''
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in ingredients:
+        yield writer.writerow(row)
+
+
+def shopping_list_json(ingredients):
+    '''Поэлементный вывод списка покупок в формате json'''
+    separator = ''
+    yield '['
+    for name, measurement_unit, amount in ingredients:
+        yield separator + json.dumps({
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+SHOPPING_LIST_FORMATS = {
+    'txt': (shopping_list_txt, 'text/plain; charset=utf-8'),
+    'csv': (shopping_list_csv, 'text/csv; charset=utf-8'),
+    'json': (shopping_list_json, 'application/json; charset=utf-8'),
+}
+
+
+def get_shopping_list(ingredient_list, file_format='txt'):
     '''Метод для формирования списка ингридиентов для скачивания'''
-    temp_shopping_cart = {}
-    for ingredient in ingredient_list:
-        name = ingredient[0]
-        temp_shopping_cart[name] = {
-            'amount': ingredient[2],
-            'measurement_unit': ingredient[1]
-        }
-        shopping_cart = ["Список покупок\n\n"]
-        for key, value in temp_shopping_cart.items():
-            shopping_cart.append(f'{key} - {value["amount"]} '
-                                 f'{value["measurement_unit"]}\n')
-    response = HttpResponse(
-        shopping_cart, content_type='text.txt; charset=utf-8'
+    generator, content_type = SHOPPING_LIST_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        generator(ingredient_list.iterator()), content_type=content_type
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{file_format}"'
     )
-    response['Content-Disposition'] = ('attachment; '
-                                       'filename="shopping_list.txt"')
     return response
+
+
+def get_bulk_ids(request):
+    '''Проверенный список id из тела запроса без повторов'''
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return list(dict.fromkeys(serializer.validated_data['ids']))
+
+
+def get_bulk_response(ids, changed, status_name, existing=()):
+    '''Ответ массовой операции с результатом для каждого id'''
+    results = []
+    for pk in ids:
+        if pk in changed:
+            result = status_name
+        elif pk in existing:
+            result = 'exists'
+        else:
+            result = 'not_found'
+        results.append({'id': pk, 'status': result})
+    return Response({'results': results})
@@ -1,38 +1,64 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import (AllowAny, IsAuthenticated,
+from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from api.filters import IngredientFilter, TagFilter
-from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
-from api.serializers import (FavoriteCartSerializer, IngredientSerializer,
-                             RecipeCreateSerializer, RecipeReadSerializer,
-                             SubscribeSerializer, TagSerializer,
-                             UserSerializer)
-from api.utils import get_shopping_list
+from api.cache import AnonymousListCacheMixin, CatalogueCacheMixin
+from api.filters import IngredientFilter, TagFilter, autocomplete_ingredients
+from api.metrics import render_metrics
+from api.pagination import (ApproximateCountPagination, CursorPaginationMixin,
+                            RecipeCursorPagination, UserCursorPagination)
+from api.permissions import IsAdmin, IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.renderers import CSVRenderer, FastJSONRenderer, PlainTextRenderer
+from api.serializers import (CartIngredientSerializer, FavoriteCartSerializer,
+                             IngredientSerializer, RecipeCreateSerializer,
+                             RecipeFastReadSerializer, SubscribeSerializer,
+                             TagSerializer, UserSerializer)
+from api.utils import get_bulk_ids, get_bulk_response, get_shopping_list
+from recipes.cart import (enqueue_deleted_recipe_refresh,
+                          schedule_recipe_refresh)
+from recipes.counters import (change_author_counter, change_recipe_counter,
+                              recount_authors, recount_deleted_users,
+                              recount_recipes)
 from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
                             ShoppingCart, Tag)
 from users.models import Subscribe, User
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(CursorPaginationMixin, DjoserUserViewSet):
     '''Вьюсет для модели User'''
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (AllowAny,)
+    cursor_pagination_class = UserCursorPagination
     additional_serializer = SubscribeSerializer
 
+    def perform_destroy(self, instance):
+        '''Удаление пользователя с пересчётом затронутых счётчиков'''
+        with recount_deleted_users([instance.id]):
+            super().perform_destroy(instance)
+
     @action(detail=False,
             permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         '''Метод для получения списка подписок'''
         user = request.user
-        authors = Subscribe.objects.filter(user=user)
+        authors = Subscribe.objects.filter(user=user).select_related(
+            'author'
+        ).prefetch_related(
+            self.get_recipes_prefetch(request.GET.get('recipes_limit'))
+        ).order_by('id')
         pages = self.paginate_queryset(authors)
         serializer = self.additional_serializer(
             pages,
@@ -40,43 +66,97 @@ class UserViewSet(DjoserUserViewSet):
             context={'request': request})
         return self.get_paginated_response(serializer.data)
 
-    @action(methods=['POST', 'DELETE'], detail=True)
+    @staticmethod
+    def get_recipes_prefetch(limit):
+        '''Превью рецептов авторов одним запросом с ограничением на автора'''
+        recipes = Recipe.objects.all()
+        if limit and limit.isdigit():
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:int(limit)]
+            ))
+        return Prefetch('author__recipes', queryset=recipes,
+                        to_attr='recipes_preview')
+
+    @action(methods=['POST', 'DELETE'], detail=True,
+            permission_classes=(IsAuthenticated,))
     def subscribe(self, request, **kwargs):
         '''Метод для создания подписки'''
         user = request.user
+        if request.method == 'DELETE':
+            return self.unsubscribe(user, kwargs.get('id'))
         author = get_object_or_404(User, id=kwargs.get('id'))
-        if request.method == 'POST':
-            if user == author:
-                return Response({
-                    'errors': 'Вы не можете подписываться на самого себя'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            if Subscribe.objects.filter(user=user, author=author).exists():
-                return Response(
-                    {'errors': 'Вы уже подписаны на данного пользователя'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            subscribe = Subscribe.objects.create(user=user, author=author)
-            serializer = self.additional_serializer(
-                subscribe, context={'request': request}
+        if user == author:
+            return Response({
+                'errors': 'Вы не можете подписываться на самого себя'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                subscribe = Subscribe.objects.create(user=user, author=author)
+                change_author_counter(Subscribe, author.id, 1)
+        except IntegrityError:
+            return Response(
+                {'errors': 'Вы уже подписаны на данного пользователя'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        if request.method == 'DELETE':
-            if user == author:
-                return Response(
-                    {'errors': 'Имена пользователя и автора совпадают'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            follow = Subscribe.objects.filter(user=user, author=author)
-            if follow.exists():
-                follow.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
+        serializer = self.additional_serializer(
+            subscribe, context={'request': request}
+        )
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def unsubscribe(self, user, author_id):
+        '''Метод удаления подписки одним DELETE'''
+        if str(user.id) == str(author_id):
             return Response(
-                {'errors': 'Подписка на автора не существует'},
+                {'errors': 'Имена пользователя и автора совпадают'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        with transaction.atomic():
+            deleted, _ = Subscribe.objects.filter(
+                user=user, author_id=author_id
+            ).delete()
+            if deleted:
+                change_author_counter(Subscribe, author_id, -1)
+        if deleted:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response(
+            {'errors': 'Подписка на автора не существует'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    @action(methods=['POST', 'DELETE'], detail=False,
+            url_path='subscribe', url_name='subscribe-bulk',
+            permission_classes=(IsAuthenticated,))
+    def subscribe_bulk(self, request):
+        '''Метод для подписки / отписки на нескольких авторов сразу'''
+        ids = get_bulk_ids(request)
+        user = request.user
+        subscribed = set(Subscribe.objects.filter(
+            user=user, author_id__in=ids
+        ).values_list('author_id', flat=True))
+        if request.method == 'DELETE':
+            with transaction.atomic():
+                Subscribe.objects.filter(
+                    user=user, author_id__in=ids
+                ).delete()
+                recount_authors(ids, (Subscribe,))
+            return get_bulk_response(ids, subscribed, 'deleted')
+        authors = set(User.objects.filter(
+            id__in=ids
+        ).exclude(id=user.id).values_list('id', flat=True))
+        with transaction.atomic():
+            Subscribe.objects.bulk_create(
+                [Subscribe(user=user, author_id=author_id)
+                 for author_id in authors - subscribed],
+                ignore_conflicts=True
+            )
+            recount_authors(authors, (Subscribe,))
+        return get_bulk_response(ids, authors - subscribed, 'created',
+                                 subscribed)
 
 
-class TagsViewSet(viewsets.ModelViewSet):
+class TagsViewSet(CatalogueCacheMixin, viewsets.ModelViewSet):
     '''Вьюсет для модели тэгов'''
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -84,7 +164,7 @@ class TagsViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ModelViewSet):
+class IngredientViewSet(CatalogueCacheMixin, viewsets.ModelViewSet):
     '''Вьюсет для модели ингридиентов'''
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -93,28 +173,97 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    @action(detail=False)
+    def autocomplete(self, request):
+        '''Подсказки ингридиентов, кэшируются только короткие префиксы'''
+        name = request.GET.get('name', '')
+        if len(name) > settings.AUTOCOMPLETE_CACHED_PREFIX_LENGTH:
+            return self.get_autocomplete(request)
+        return self.get_cached_response(self.get_autocomplete, request)
+
+    def get_autocomplete(self, request):
+        '''Ограниченный список ингридиентов, подходящих под ввод'''
+        name = request.GET.get('name', '')
+        limit = request.GET.get('limit', '')
+        if limit.isdigit():
+            limit = min(int(limit), settings.AUTOCOMPLETE_MAX_LIMIT)
+        else:
+            limit = settings.AUTOCOMPLETE_LIMIT
+        if not name:
+            return Response([])
+        queryset = autocomplete_ingredients(self.queryset, name, limit)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousListCacheMixin, CursorPaginationMixin,
+                    viewsets.ModelViewSet):
     '''Вьюсет для модели рецептов'''
     queryset = Recipe.objects.all()
     serializer_class = RecipeCreateSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly)
+    pagination_class = ApproximateCountPagination
+    cursor_pagination_class = RecipeCursorPagination
     additional_serializer = FavoriteCartSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = TagFilter
+    cached_list_params = ('tags', 'author', 'page', 'limit')
+
+    def get_queryset(self):
+        '''Аннотация флагов избранного и корзины для текущего пользователя'''
+        queryset = Recipe.objects.all()
+        if self.request.method in SAFE_METHODS:
+            queryset = self.get_read_queryset(queryset)
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField())
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+        )
+
+    @staticmethod
+    def get_read_queryset(queryset):
+        '''Подгрузка автора, тэгов и ингридиентов для чтения рецептов'''
+        return queryset.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientsinrecipe_set',
+                queryset=IngredientsInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
 
     def get_serializer_class(self):
         '''Определение сериализатора - чтение / запись'''
         if self.request.method in ['POST', 'PATCH', 'PUT']:
             return RecipeCreateSerializer
-        return RecipeReadSerializer
+        return RecipeFastReadSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        '''Метод создания рецепта базовый'''
+        '''Создание рецепта с увеличением счётчика автора'''
         serializer.save(author=self.request.user)
+        change_author_counter(Recipe, self.request.user.id, 1)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        '''Удаление рецепта с пересчётом корзин и счётчика автора'''
+        enqueue_deleted_recipe_refresh([instance.id])
+        _, deleted = instance.delete()
+        if deleted.get(Recipe._meta.label):
+            change_author_counter(Recipe, instance.author_id, -1)
 
     @action(detail=True, methods=['POST', 'DELETE'],
-            permission_classes=(IsOwnerOrReadOnly,))
+            permission_classes=(IsAuthenticated,))
     def favorite(self, request, **kwargs):
         '''Метод создания или удаления избранного'''
         if request.method == 'POST':
@@ -122,6 +271,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'DELETE':
             return self.delete_recipe(Favorite, request, kwargs.get('pk'))
 
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='favorite', url_name='favorite-bulk',
+            permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request):
+        '''Метод для массового добавления / удаления избранного'''
+        if request.method == 'POST':
+            return self.add_recipes(Favorite, request)
+        return self.delete_recipes(Favorite, request)
+
     @action(detail=True, methods=['GET', 'POST', 'DELETE'],
             permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, **kwargs):
@@ -131,35 +289,109 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if request.method == 'DELETE':
             return self.delete_recipe(ShoppingCart, request, kwargs.get('pk'))
 
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart', url_name='shopping-cart-bulk',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request):
+        '''Метод для массового добавления / удаления рецептов в корзине'''
+        if request.method == 'POST':
+            return self.add_recipes(ShoppingCart, request)
+        return self.delete_recipes(ShoppingCart, request)
+
     @action(methods=['GET'], detail=False, permission_classes=(
-        IsAuthenticated,))
+        IsAuthenticated,), renderer_classes=(
+        PlainTextRenderer, CSVRenderer, FastJSONRenderer))
     def download_shopping_cart(self, request):
         '''Метод для скачивания корзины'''
-        ingredients = IngredientsInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values_list(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).order_by('ingredient__name').annotate(ingredient_sum=Sum('amount'))
-        return get_shopping_list(ingredients)
+        ingredients = request.user.cart_ingredients.values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        ).order_by('ingredient__name')
+        return get_shopping_list(ingredients,
+                                 request.accepted_renderer.format)
+
+    @action(detail=False,
+            permission_classes=(IsAuthenticated,))
+    def cart_summary(self, request):
+        '''Метод для получения суммарных ингридиентов корзины'''
+        ingredients = request.user.cart_ingredients.select_related(
+            'ingredient'
+        ).order_by('ingredient__name')
+        serializer = CartIngredientSerializer(ingredients, many=True)
+        return Response(serializer.data)
 
     def add_recipe(self, model, request, pk):
         '''Метод добавления рецепта в избранное'''
         recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(recipe=recipe, user=request.user).exists():
+        try:
+            with transaction.atomic():
+                instance = model.objects.create(user=request.user,
+                                                recipe=recipe)
+                change_recipe_counter(model, recipe.id, 1)
+                if model is ShoppingCart:
+                    schedule_recipe_refresh([recipe.id],
+                                            user_ids=[request.user.id])
+        except IntegrityError:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        instance = model.objects.create(user=request.user, recipe=recipe)
         serializer = FavoriteCartSerializer(instance,
                                             context={'request': request})
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_recipe(self, model, request, pk):
-        '''Метод удаления рецепта из избранного'''
-        recipe = get_object_or_404(Recipe, id=pk)
-        if model.objects.filter(
-            user=request.user, recipe=recipe
-        ).exists():
-            model.objects.filter(
-                user=request.user, recipe=recipe
+        '''Удаление одним DELETE, счётчик меняется только если строка была'''
+        with transaction.atomic():
+            deleted, _ = model.objects.filter(
+                user=request.user, recipe_id=pk
             ).delete()
+            if deleted:
+                change_recipe_counter(model, pk, -1)
+                if model is ShoppingCart:
+                    schedule_recipe_refresh([pk], user_ids=[request.user.id])
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    def add_recipes(self, model, request):
+        '''Метод массового добавления рецептов одним INSERT'''
+        ids = get_bulk_ids(request)
+        recipes = set(Recipe.objects.filter(
+            id__in=ids
+        ).values_list('id', flat=True))
+        existing = set(model.objects.filter(
+            user=request.user, recipe_id__in=recipes
+        ).values_list('recipe_id', flat=True))
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [model(user=request.user, recipe_id=recipe_id)
+                 for recipe_id in recipes - existing],
+                ignore_conflicts=True
+            )
+            recount_recipes(recipes, (model,))
+            if model is ShoppingCart:
+                schedule_recipe_refresh(recipes - existing,
+                                        user_ids=[request.user.id])
+        return get_bulk_response(ids, recipes - existing, 'created',
+                                 existing)
+
+    def delete_recipes(self, model, request):
+        '''Метод массового удаления рецептов одним DELETE'''
+        ids = get_bulk_ids(request)
+        existing = set(model.objects.filter(
+            user=request.user, recipe_id__in=ids
+        ).values_list('recipe_id', flat=True))
+        with transaction.atomic():
+            model.objects.filter(
+                user=request.user, recipe_id__in=ids
+            ).delete()
+            recount_recipes(ids, (model,))
+            if model is ShoppingCart:
+                schedule_recipe_refresh(existing, user_ids=[request.user.id])
+        return get_bulk_response(ids, existing, 'deleted')
+
+
+class MetricsView(APIView):
+    '''Метрики запросов в формате Prometheus для администраторов'''
+    permission_classes = (IsAdmin,)
+
+    def get(self, request):
+        content, content_type = render_metrics()
+        return HttpResponse(content, content_type=content_type)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -19,6 +20,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -31,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +75,60 @@ DATABASES = {
     }
 }
 
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND',
+    default='django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION',
+    default=os.path.join(tempfile.gettempdir(), 'foodgram_cache')
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=5000)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Версии справочников не должны вытесняться вместе с ответами:
+    # потеря версии сбрасывает весь кэш справочника
+    'versions': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_VERSIONS_LOCATION',
+            default=os.path.join(CACHE_LOCATION, 'versions')
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10 ** 9,
+        },
+    },
+}
+
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+ANONYMOUS_LIST_CACHE_TIMEOUT = 60 * 10
+
+RECIPE_IMAGE_MAX_BYTES = 5 * 1024 * 1024
+RECIPE_IMAGE_MAX_PIXELS = 4096 * 4096
+RECIPE_IMAGE_THUMBNAIL_SIZE = (480, 480)
+
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', default=2))
+JOBS_POLL_INTERVAL = 1
+JOBS_CLAIM_BATCH = 10
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_LOCK_TIMEOUT = 5 * 60
+
+BULK_MAX_IDS = 100
+
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+AUTOCOMPLETE_CACHED_PREFIX_LENGTH = 2
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -97,10 +154,20 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.PageLimitPagination',
     'PAGE_SIZE': 6,
 }
 
+PAGINATION_COUNT_CACHE_TIMEOUT = 30
+
+PAGINATION_EXACT_COUNT_CACHE_TIMEOUT = 60 * 10
+
+PAGINATION_EXACT_COUNT_THRESHOLD = 10000
+
 
 DJOSER = {
     'HIDE_USERS': False,
@@ -0,0 +1,19 @@
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    '''Очистка метрик прошлого запуска в общей папке воркеров'''
+    path = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        os.makedirs(path, exist_ok=True)
+        for name in glob.glob(os.path.join(path, '*.db')):
+            os.remove(name)
+
+
+def child_exit(server, worker):
+    '''Удаление живых метрик остановленного воркера'''
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
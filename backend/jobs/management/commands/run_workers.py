@@ -0,0 +1,53 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import connections
+
+from jobs.registry import claim_job, run_job
+
+
+def work(once, poll_interval):
+    '''Цикл обработчика: выполнять задачи, пока они есть в очереди'''
+    processed = 0
+    try:
+        while True:
+            job = claim_job()
+            if job is None:
+                if once:
+                    return processed
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+            processed += 1
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Запускает обработчики фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOBS_WORKERS)
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            default='thread')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true',
+                            help='Завершиться, когда очередь опустеет')
+
+    def handle(self, *args, **options):
+        executor_class = (ProcessPoolExecutor if options['mode'] == 'process'
+                          else ThreadPoolExecutor)
+        workers = options['workers']
+        connections.close_all()
+        with executor_class(max_workers=workers) as executor:
+            futures = [
+                executor.submit(work, options['once'],
+                                options['poll_interval'])
+                for _ in range(workers)
+            ]
+            processed = sum(future.result() for future in futures)
+        self.stdout.write(f'Выполнено задач: {processed}')
@@ -0,0 +1,70 @@
+from django.db import models
+from django.utils import timezone
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job(models.Model):
+    JOB_STATUSES = [
+        (PENDING, PENDING),
+        (RUNNING, RUNNING),
+        (DONE, DONE),
+        (FAILED, FAILED),
+    ]
+    name = models.CharField(
+        'Задача',
+        max_length=200
+    )
+    payload = models.TextField(
+        'Параметры задачи в формате json',
+        default='{}'
+    )
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        unique=True,
+        null=True,
+        blank=True
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=JOB_STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Количество попыток',
+        default=0
+    )
+    run_at = models.DateTimeField(
+        'Время запуска',
+        default=timezone.now
+    )
+    locked_at = models.DateTimeField(
+        'Время захвата обработчиком',
+        null=True,
+        blank=True
+    )
+    last_error = models.TextField(
+        'Последняя ошибка',
+        blank=True
+    )
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True
+    )
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(fields=('status', 'run_at'),
+                         name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,79 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.models import DONE, FAILED, PENDING, RUNNING, Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    '''Декоратор регистрации функции как фоновой задачи'''
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, key=None):
+    '''Постановка задачи в очередь, повторный ключ не создаёт дубликат'''
+    if name not in TASKS:
+        raise KeyError(f'Задача {name} не зарегистрирована')
+    payload = json.dumps(payload or {})
+    if key is None:
+        return Job.objects.create(name=name, payload=payload)
+    try:
+        with transaction.atomic():
+            return Job.objects.create(name=name, payload=payload,
+                                      idempotency_key=key)
+    except IntegrityError:
+        return Job.objects.get(idempotency_key=key)
+
+
+def claim_job():
+    '''Захват одной готовой к выполнению задачи'''
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    ready = Job.objects.filter(
+        Q(status=PENDING, run_at__lte=now)
+        | Q(status=RUNNING, locked_at__lt=stale)
+    )
+    for job in ready.only('id', 'status')[:settings.JOBS_CLAIM_BATCH]:
+        claimed = Job.objects.filter(
+            id=job.id, status=job.status
+        ).filter(
+            Q(status=PENDING) | Q(locked_at__lt=stale)
+        ).update(status=RUNNING, locked_at=now)
+        if claimed:
+            return Job.objects.get(id=job.id)
+    return None
+
+
+def run_job(job):
+    '''Выполнение задачи с повтором при ошибке'''
+    job.attempts += 1
+    try:
+        TASKS[job.name](**json.loads(job.payload))
+    except Exception:
+        job.last_error = traceback.format_exc()
+        logger.exception('Ошибка выполнения задачи %s', job)
+        if job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+            job.status = FAILED
+        else:
+            job.status = PENDING
+            job.run_at = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+    else:
+        job.status = DONE
+    job.locked_at = None
+    job.save(update_fields=('status', 'attempts', 'run_at', 'locked_at',
+                            'last_error'))
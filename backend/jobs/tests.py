@@ -0,0 +1,100 @@
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import (TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.utils import timezone
+
+from jobs.models import DONE, FAILED, PENDING, RUNNING, Job
+from jobs.registry import enqueue, task
+
+WORKERS = 4
+calls = []
+calls_lock = threading.Lock()
+
+
+@task('jobs.tests.record')
+def record(value):
+    with calls_lock:
+        calls.append(value)
+
+
+@task('jobs.tests.fail')
+def fail(value):
+    record(value)
+    raise RuntimeError(f'Ошибка задачи {value}')
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_DELAY=60)
+class RunWorkersTests(TransactionTestCase):
+    '''Обработчики run_workers --once над реальной очередью задач'''
+
+    def setUp(self):
+        calls.clear()
+
+    def run_workers(self, workers=1):
+        '''Число задач, выполненных до опустошения очереди'''
+        out = StringIO()
+        call_command('run_workers', '--once', '--workers', str(workers),
+                     stdout=out)
+        return int(out.getvalue().split(':')[-1])
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_parallel_workers_run_every_job_once(self):
+        for value in range(20):
+            enqueue('jobs.tests.record', {'value': value})
+        self.assertEqual(self.run_workers(WORKERS), 20)
+        self.assertEqual(sorted(calls), list(range(20)))
+        self.assertEqual(Job.objects.exclude(status=DONE).count(), 0)
+
+    def test_duplicate_key(self):
+        first = enqueue('jobs.tests.record', {'value': 1}, key='record:1')
+        second = enqueue('jobs.tests.record', {'value': 2}, key='record:1')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(json.loads(second.payload), {'value': 1})
+        self.assertEqual(self.run_workers(), 1)
+        self.assertEqual(calls, [1])
+
+    def test_repeated_runs(self):
+        enqueue('jobs.tests.record', {'value': 1}, key='record:1')
+        self.assertEqual(self.run_workers(), 1)
+        enqueue('jobs.tests.record', {'value': 1}, key='record:1')
+        self.assertEqual(self.run_workers(), 0)
+        self.assertEqual(calls, [1])
+
+    def test_retry_with_backoff(self):
+        job = enqueue('jobs.tests.fail', {'value': 1})
+        started = timezone.now()
+        with self.assertLogs('jobs.registry', 'ERROR'):
+            self.assertEqual(self.run_workers(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (PENDING, 1))
+        self.assertIn('RuntimeError', job.last_error)
+        self.assertGreaterEqual(job.run_at, started + timedelta(seconds=60))
+        self.assertEqual(self.run_workers(), 0)
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs('jobs.registry', 'ERROR'):
+            self.assertEqual(self.run_workers(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (FAILED, 2))
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        self.assertEqual(self.run_workers(), 0)
+        self.assertEqual(calls, [1, 1])
+
+    @override_settings(JOBS_LOCK_TIMEOUT=60)
+    def test_stale_lock_is_reclaimed(self):
+        stale = enqueue('jobs.tests.record', {'value': 1})
+        locked = enqueue('jobs.tests.record', {'value': 2})
+        Job.objects.filter(id=stale.id).update(
+            status=RUNNING, locked_at=timezone.now() - timedelta(minutes=2)
+        )
+        Job.objects.filter(id=locked.id).update(
+            status=RUNNING, locked_at=timezone.now()
+        )
+        self.assertEqual(self.run_workers(), 1)
+        self.assertEqual(calls, [1])
+        locked.refresh_from_db()
+        self.assertEqual(locked.status, RUNNING)
@@ -1,7 +1,39 @@
 from django.contrib import admin
 
-from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.cart import (enqueue_deleted_recipe_refresh,
+                          enqueue_recipe_refresh, schedule_recipe_refresh)
+from recipes.counters import recount_authors, recount_recipes
+from recipes.models import (CartIngredient, Favorite, Ingredient,
+                            IngredientsInRecipe, Recipe, ShoppingCart, Tag)
+
+
+class RefreshAdminMixin:
+    '''Пересчёт зависимых данных после изменений в админке'''
+
+    def collect(self, objs):
+        '''Данные, нужные для пересчёта, до изменения строк'''
+        return objs
+
+    def refresh(self, collected):
+        raise NotImplementedError
+
+    def save_model(self, request, obj, form, change):
+        objs = [obj]
+        if change:
+            objs.append(self.model.objects.get(pk=obj.pk))
+        collected = self.collect(objs)
+        super().save_model(request, obj, form, change)
+        self.refresh(collected)
+
+    def delete_model(self, request, obj):
+        collected = self.collect([obj])
+        super().delete_model(request, obj)
+        self.refresh(collected)
+
+    def delete_queryset(self, request, queryset):
+        collected = self.collect(list(queryset))
+        super().delete_queryset(request, queryset)
+        self.refresh(collected)
 
 
 @admin.register(Tag)
@@ -15,20 +47,54 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = list_display = ('id', 'author', 'name')
+class RecipeAdmin(RefreshAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'author', 'name', 'favorites_count',
+                    'in_carts_count')
+    readonly_fields = ('favorites_count', 'in_carts_count')
+
+    def refresh(self, collected):
+        recount_authors({recipe.author_id for recipe in collected},
+                        (Recipe,))
+
+    def delete_model(self, request, obj):
+        enqueue_deleted_recipe_refresh([obj.id])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        enqueue_deleted_recipe_refresh(queryset.values_list('id', flat=True))
+        super().delete_queryset(request, queryset)
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(RefreshAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
 
+    def refresh(self, collected):
+        recipe_ids = {item.recipe_id for item in collected}
+        recount_recipes(recipe_ids, (ShoppingCart,))
+        schedule_recipe_refresh(recipe_ids,
+                                {item.user_id for item in collected})
+
 
 @admin.register(IngredientsInRecipe)
-class IngredientsInRecipeAdmin(admin.ModelAdmin):
+class IngredientsInRecipeAdmin(RefreshAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
 
+    def refresh(self, collected):
+        enqueue_recipe_refresh(
+            {item.recipe_id for item in collected},
+            ingredient_ids={item.ingredient_id for item in collected}
+        )
+
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RefreshAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'recipe')
+
+    def refresh(self, collected):
+        recount_recipes({item.recipe_id for item in collected}, (Favorite,))
+
+
+@admin.register(CartIngredient)
+class CartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount')
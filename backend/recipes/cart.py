@@ -0,0 +1,77 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Sum
+
+from jobs.registry import enqueue
+from recipes.models import CartIngredient, IngredientsInRecipe, ShoppingCart
+from users.models import User
+
+
+def rebuild_carts(user_ids=None, ingredient_ids=None):
+    '''Пересчёт суммарного количества ингридиентов в корзинах'''
+    filters = {'recipe__shopping_cart__isnull': False}
+    stale = CartIngredient.objects.all()
+    if user_ids is not None:
+        filters['recipe__shopping_cart__user__in'] = user_ids
+        stale = stale.filter(user_id__in=user_ids)
+    if ingredient_ids is not None:
+        filters['ingredient_id__in'] = ingredient_ids
+        stale = stale.filter(ingredient_id__in=ingredient_ids)
+    totals = IngredientsInRecipe.objects.filter(**filters).values_list(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).order_by().annotate(total=Sum('amount'))
+    with transaction.atomic(savepoint=False):
+        stale.delete()
+        CartIngredient.objects.bulk_create([
+            CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                           total_amount=total)
+            for user_id, ingredient_id, total in totals
+        ])
+
+
+def refresh_cart(user_ids, ingredient_ids):
+    '''Пересчёт затронутых строк корзин под блокировкой пользователей'''
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+        rebuild_carts(user_ids, ingredient_ids)
+
+
+def schedule_refresh(user_ids, ingredient_ids):
+    '''Пересчёт корзин после фиксации текущей транзакции'''
+    user_ids = set(user_ids)
+    ingredient_ids = set(ingredient_ids)
+    if user_ids and ingredient_ids:
+        transaction.on_commit(
+            lambda: refresh_cart(user_ids, ingredient_ids)
+        )
+
+
+def schedule_recipe_refresh(recipe_ids, user_ids):
+    '''Пересчёт корзин пользователей по ингридиентам рецептов'''
+    schedule_refresh(user_ids, IngredientsInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', flat=True))
+
+
+def enqueue_recipe_refresh(recipe_ids, ingredient_ids=None):
+    '''Фоновый пересчёт всех корзин с рецептами, задача на рецепт'''
+    payload = {}
+    if ingredient_ids is not None:
+        payload['ingredient_ids'] = sorted(set(ingredient_ids))
+    for recipe_id in set(recipe_ids):
+        enqueue('recipes.refresh_carts', dict(payload, recipe_id=recipe_id))
+
+
+def enqueue_deleted_recipe_refresh(recipe_ids):
+    '''Фоновый пересчёт корзин с удаляемыми рецептами по их владельцам'''
+    user_ids = defaultdict(list)
+    for recipe_id, user_id in ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'user_id'):
+        user_ids[recipe_id].append(user_id)
+    for recipe_id, users in user_ids.items():
+        enqueue('recipes.refresh_carts',
+                {'recipe_id': recipe_id, 'user_ids': users})
@@ -0,0 +1,95 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.cart import enqueue_deleted_recipe_refresh
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+AUTHOR_COUNTERS = {
+    Recipe: 'recipes_count',
+    Subscribe: 'followers_count',
+}
+
+
+def change_counter(queryset, field, delta):
+    '''Изменение счётчика выражением F() без чтения строк'''
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_recipe_counter(model, recipe_id, delta):
+    '''Изменение счётчика рецепта на число добавленных / удалённых строк'''
+    change_counter(Recipe.objects.filter(id=recipe_id),
+                   RECIPE_COUNTERS[model], delta)
+
+
+def change_author_counter(model, author_id, delta):
+    '''Изменение счётчика автора на число добавленных / удалённых строк'''
+    change_counter(User.objects.filter(id=author_id),
+                   AUTHOR_COUNTERS[model], delta)
+
+
+def count_subquery(model, field):
+    '''Подзапрос количества связанных строк для пересчёта счётчика'''
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def recount_recipes(recipe_ids=None, models=tuple(RECIPE_COUNTERS)):
+    '''Пересчёт счётчиков рецептов по фактическим данным'''
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+    recipes.update(**{
+        RECIPE_COUNTERS[model]: count_subquery(model, 'recipe')
+        for model in models
+    })
+
+
+def recount_authors(author_ids=None, models=tuple(AUTHOR_COUNTERS)):
+    '''Пересчёт счётчиков авторов по фактическим данным'''
+    authors = User.objects.all()
+    if author_ids is not None:
+        authors = authors.filter(id__in=author_ids)
+    authors.update(**{
+        AUTHOR_COUNTERS[model]: count_subquery(model, 'author')
+        for model in models
+    })
+
+
+def recount():
+    '''Пересчёт всех счётчиков по фактическим данным'''
+    recount_recipes()
+    recount_authors()
+
+
+@contextmanager
+def recount_deleted_users(user_ids):
+    '''Пересчёт счётчиков и корзин, затронутых удалением пользователей'''
+    with transaction.atomic():
+        recipe_ids = set()
+        for model in RECIPE_COUNTERS:
+            recipe_ids.update(model.objects.filter(
+                user_id__in=user_ids
+            ).values_list('recipe_id', flat=True))
+        author_ids = set(Subscribe.objects.filter(
+            user_id__in=user_ids
+        ).values_list('author_id', flat=True))
+        enqueue_deleted_recipe_refresh(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).values_list('id', flat=True))
+        yield
+        recount_recipes(recipe_ids)
+        recount_authors(author_ids, (Subscribe,))
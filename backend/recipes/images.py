@@ -0,0 +1,74 @@
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from PIL import Image
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}\.\w+$')
+
+THUMBNAIL = 'thumb.webp'
+VARIANTS = {
+    'thumb.jpg': 'JPEG',
+    THUMBNAIL: 'WEBP',
+}
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Хранилище, не дублирующее файлы с одинаковым хэшем содержимого'''
+
+    def get_available_name(self, name, max_length=None):
+        if HASHED_NAME.match(os.path.basename(name)):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if HASHED_NAME.match(os.path.basename(name)) and self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def get_variant_name(name, variant):
+    '''Имя файла уменьшенной копии изображения'''
+    directory, filename = os.path.split(name)
+    root = os.path.splitext(filename)[0]
+    return os.path.join(directory, 'variants', f'{root}.{variant}')
+
+
+def get_variant_url(image, variant=THUMBNAIL):
+    '''Ссылка на уменьшенную копию или на оригинал, если копии нет'''
+    name = get_variant_name(image.name, variant)
+    if image.storage.exists(name):
+        return image.storage.url(name)
+    return image.url
+
+
+def get_missing_variants(image):
+    '''Имена ещё не созданных уменьшенных копий изображения'''
+    names = {
+        variant: get_variant_name(image.name, variant)
+        for variant in VARIANTS
+    }
+    return {
+        variant: name for variant, name in names.items()
+        if not image.storage.exists(name)
+    }
+
+
+def create_variants(image):
+    '''Метод для создания уменьшенных копий изображения'''
+    missing = get_missing_variants(image)
+    if not missing:
+        return
+    with image.storage.open(image.name) as file:
+        thumbnail = Image.open(file)
+        thumbnail.thumbnail(settings.RECIPE_IMAGE_THUMBNAIL_SIZE)
+        thumbnail = thumbnail.convert('RGB')
+    for variant, name in missing.items():
+        buffer = BytesIO()
+        thumbnail.save(buffer, VARIANTS[variant], quality=85)
+        image.storage.save(name, ContentFile(buffer.getvalue()))
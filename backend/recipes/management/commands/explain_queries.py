@@ -0,0 +1,39 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Выводит планы выполнения основных запросов списка рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=6)
+
+    def get_queries(self, limit):
+        user = User.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        if user is None or tag is None:
+            raise CommandError('Заполните базу данных тестовыми данными')
+        recipes = Recipe.objects.all()
+        return {
+            'Список рецептов': recipes[:limit],
+            'Рецепты автора': recipes.filter(author=user)[:limit],
+            'Рецепты по тэгу': recipes.filter(
+                tags__slug=tag.slug
+            ).distinct()[:limit],
+            'Избранное': recipes.filter(favorites__user=user)[:limit],
+            'Список покупок': recipes.filter(
+                shopping_cart__user=user
+            )[:limit],
+        }
+
+    def handle(self, *args, **options):
+        analyze = connection.vendor == 'postgresql'
+        for title, queryset in self.get_queries(options['limit']).items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(analyze=analyze) if analyze
+                              else queryset.explain())
+            self.stdout.write('')
@@ -1,7 +1,11 @@
 import csv
+import os
+import time
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.cache import bump_catalogue_version
 from recipes.models import Ingredient
 
 
@@ -9,21 +13,84 @@ class Command(BaseCommand):
     help = 'Заполняет базу данных контентом из csv-файлов'
 
     def add_arguments(self, parser):
-        parser.add_argument('file_path', type=str)
-
-    def import_ingredients(self, directory):
-        with open(directory + 'ingredients.csv', 'r', encoding='UTF-8') as df:
-            temp_data = []
-            reader = csv.reader(df)
-            for row in reader:
-                temp_data.append(
-                    Ingredient(
-                        name=row[0],
-                        measurement_unit=row[1],
-                    )
+        parser.add_argument('file_path', type=str,
+                            help='Путь к ingredients.csv или к его папке')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--copy', action='store_true',
+                            help='Загрузка через COPY FROM STDIN (PostgreSQL)')
+
+    def get_file_path(self, path):
+        if os.path.isdir(path):
+            path = os.path.join(path, 'ingredients.csv')
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл {path} не найден')
+        return path
+
+    def import_ingredients(self, df, batch_size):
+        '''Загрузка пачками без повторного создания существующих строк'''
+        processed = 0
+        batch = []
+        reader = csv.reader(df)
+        for row in reader:
+            if not any(field.strip() for field in row):
+                continue
+            if len(row) != 2:
+                raise CommandError(
+                    f'Строка {reader.line_num}: ожидалось 2 поля '
+                    f'(name, measurement_unit), получено {len(row)}'
                 )
-            Ingredient.objects.bulk_create(temp_data)
+            name, measurement_unit = row
+            batch.append(Ingredient(name=name,
+                                    measurement_unit=measurement_unit))
+            if len(batch) >= batch_size:
+                processed += self.save_batch(batch)
+                batch = []
+        return processed + self.save_batch(batch)
+
+    def save_batch(self, batch):
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            self.stdout.write(f'Обработано строк: {len(batch)}')
+        return len(batch)
+
+    @transaction.atomic
+    def copy_ingredients(self, df):
+        '''Загрузка через COPY во временную таблицу и INSERT ON CONFLICT'''
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredients_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredients_import (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)', df
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredients_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            cursor.execute('SELECT count(*) FROM ingredients_import')
+            return cursor.fetchone()[0]
 
     def handle(self, *args, **options):
-        directory = options['file_path']
-        self.import_ingredients(directory)
+        path = self.get_file_path(options['file_path'])
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('COPY доступен только для PostgreSQL')
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        with open(path, 'r', encoding='UTF-8') as df:
+            if options['copy']:
+                processed = self.copy_ingredients(df)
+            else:
+                processed = self.import_ingredients(df,
+                                                    options['batch_size'])
+        created = Ingredient.objects.count() - count_before
+        bump_catalogue_version(Ingredient)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {processed}, добавлено: {created}, '
+            f'время: {time.monotonic() - started:.2f} с'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.cart import rebuild_carts
+from recipes.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики рецептов и пользователей '
+            'и суммарные списки покупок')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            recount()
+            rebuild_carts()
+        self.stdout.write(
+            self.style.SUCCESS('Счётчики и списки покупок пересчитаны')
+        )
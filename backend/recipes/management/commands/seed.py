@@ -0,0 +1,183 @@
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+
+from api.cache import bump_catalogue_version
+from recipes.cart import rebuild_carts
+from recipes.counters import recount
+from recipes.models import (Favorite, Ingredient, IngredientsInRecipe, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Subscribe, User
+
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+WORDS = (
+    'суп', 'салат', 'пирог', 'рагу', 'каша', 'соус', 'запеканка', 'блины',
+    'курица', 'говядина', 'рыба', 'грибы', 'овощи', 'сыр', 'томаты',
+    'картофель', 'рис', 'гречка', 'капуста', 'тыква', 'ягоды', 'яблоки',
+    'острый', 'домашний', 'летний', 'быстрый', 'печёный', 'тушёный',
+)
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу данных синтетическими данными для бенчмарков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=10)
+        parser.add_argument('--ingredients', type=int, default=500,
+                            help='Минимальное число ингридиентов в базе')
+        parser.add_argument('--ingredients-per-recipe', type=int, nargs=2,
+                            default=(3, 12), metavar=('MIN', 'MAX'))
+        parser.add_argument('--tags-per-recipe', type=int, nargs=2,
+                            default=(1, 3), metavar=('MIN', 'MAX'))
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Среднее число избранных на пользователя')
+        parser.add_argument('--cart', type=int, default=5,
+                            help='Среднее число рецептов в корзине')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Среднее число подписок на пользователя')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='benchmark')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.weights = {}
+        with transaction.atomic():
+            tags = self.create_tags(options['tags'])
+            ingredients = self.create_ingredients(options['ingredients'])
+            users = self.create_users(options['users'], options['password'])
+            recipes = self.create_recipes(
+                users, options['recipes'], tags, ingredients,
+                options['tags_per_recipe'],
+                options['ingredients_per_recipe']
+            )
+            self.create_relations(Favorite, users, recipes,
+                                  options['favorites'])
+            self.create_relations(ShoppingCart, users, recipes,
+                                  options['cart'])
+            self.create_subscriptions(users, options['subscriptions'])
+            recount()
+            rebuild_carts()
+        bump_catalogue_version(Tag)
+        bump_catalogue_version(Ingredient)
+        bump_catalogue_version(Recipe)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, '
+            f'рецептов: {len(recipes)} '
+            f'за {time.perf_counter() - start:.1f} с'
+        ))
+
+    def bulk_create(self, model, objects):
+        '''Вставка пачками не больше, чем допускает СУБД'''
+        batch_size = min(self.batch_size, connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objects
+        ))
+        model.objects.bulk_create(objects, batch_size=max(batch_size, 1),
+                                  ignore_conflicts=True)
+
+    def skewed_sample(self, population, size):
+        '''Выборка с перекосом в пользу первых элементов (закон Ципфа)'''
+        weights = self.weights.get(len(population))
+        if weights is None:
+            weights = self.weights[len(population)] = list(
+                itertools.accumulate(
+                    1 / rank for rank in range(1, len(population) + 1)
+                )
+            )
+        size = min(size, len(population))
+        sample = set()
+        while len(sample) < size:
+            sample.update(self.rng.choices(population, cum_weights=weights,
+                                           k=size - len(sample)))
+        return sample
+
+    def create_tags(self, count):
+        existing = Tag.objects.count()
+        self.bulk_create(Tag, [
+            Tag(name=f'Тэг {number}', color=f'#{number:06x}',
+                slug=f'tag-{number}')
+            for number in range(existing, count)
+        ])
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def create_ingredients(self, count):
+        existing = Ingredient.objects.count()
+        self.bulk_create(Ingredient, [
+            Ingredient(name=f'{self.rng.choice(WORDS)} {number}',
+                       measurement_unit=self.rng.choice(UNITS))
+            for number in range(existing, count)
+        ])
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, count, password):
+        '''Пользователи с одним заранее посчитанным хэшем пароля'''
+        first = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        password = make_password(password)
+        self.bulk_create(User, [
+            User(username=f'seed{number}', email=f'seed{number}@example.com',
+                 first_name='Имя', last_name=f'Фамилия {number}',
+                 password=password)
+            for number in range(first, first + count)
+        ])
+        return list(User.objects.filter(
+            id__gte=first, username__startswith='seed'
+        ).values_list('id', flat=True))
+
+    def create_recipes(self, users, count, tags, ingredients, tags_range,
+                       ingredients_range):
+        first = (Recipe.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        self.bulk_create(Recipe, [
+            Recipe(author_id=self.rng.choice(users),
+                   name=' '.join(self.rng.sample(WORDS, 3)).capitalize(),
+                   text=' '.join(self.rng.choices(WORDS, k=60)),
+                   image='recipes/seed.png',
+                   cooking_time=self.rng.randint(5, 180))
+            for _ in range(count)
+        ])
+        recipes = list(Recipe.objects.filter(
+            id__gte=first, author_id__in=users
+        ).values_list('id', flat=True))
+        self.bulk_create(Recipe.tags.through, [
+            Recipe.tags.through(recipe_id=recipe, tag_id=tag)
+            for recipe in recipes
+            for tag in self.skewed_sample(tags,
+                                          self.rng.randint(*tags_range))
+        ])
+        self.bulk_create(IngredientsInRecipe, [
+            IngredientsInRecipe(recipe_id=recipe, ingredient_id=ingredient,
+                                amount=self.rng.randint(1, 500))
+            for recipe in recipes
+            for ingredient in self.skewed_sample(
+                ingredients, self.rng.randint(*ingredients_range)
+            )
+        ])
+        return recipes
+
+    def create_relations(self, model, users, recipes, average):
+        '''Избранное и корзины с перекосом в пользу популярных рецептов'''
+        self.bulk_create(model, [
+            model(user_id=user, recipe_id=recipe)
+            for user in users
+            for recipe in self.skewed_sample(
+                recipes, self.rng.randint(0, 2 * average)
+            )
+        ])
+
+    def create_subscriptions(self, users, average):
+        self.bulk_create(Subscribe, [
+            Subscribe(user_id=user, author_id=author)
+            for user in users
+            for author in self.skewed_sample(
+                users, self.rng.randint(0, 2 * average)
+            )
+            if author != user
+        ])
@@ -1,7 +1,9 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
 from django.db import models
 
+from recipes.images import ContentAddressedStorage
 from users.models import User
 
 
@@ -50,6 +52,10 @@ class Ingredient(models.Model):
         ordering = ('name',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            models.UniqueConstraint(fields=('name', 'measurement_unit'),
+                                    name='unique_ingredient_name_unit')
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}.'
@@ -76,7 +82,8 @@ class Recipe(models.Model):
     name = models.CharField(
         'Название рецепта', max_length=200)
     image = models.ImageField(
-        'Картинка', upload_to='recipes/')
+        'Картинка', upload_to='recipes/',
+        storage=ContentAddressedStorage())
     text = models.TextField(
         'Рецепт приготовления блюда',
         max_length=3000)
@@ -91,11 +98,30 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=('-pub_date', 'id'),
+                         name='recipe_pub_date_id_idx'),
+        ]
 
     def __str__(self):
         return f'Рецепт блюда "{self.name}" автора {self.author}'
@@ -150,6 +176,10 @@ class ShoppingCart(models.Model):
             models.UniqueConstraint(fields=('user', 'recipe'),
                                     name='unique_user_recipe_shopping_list')
         ]
+        indexes = [
+            models.Index(fields=('recipe', 'user'),
+                         name='shopping_cart_recipe_user_idx'),
+        ]
 
     def __str__(self):
         return f'Список покупок пользователя {self.user.username}'
@@ -177,3 +207,36 @@ class Favorite(models.Model):
             models.UniqueConstraint(fields=('user', 'recipe'),
                                     name='unique_user_favorrecipe')
         ]
+        indexes = [
+            models.Index(fields=('recipe', 'user'),
+                         name='favorite_recipe_user_idx'),
+        ]
+
+
+class CartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        'Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'ingredient'),
+                                    name='unique_user_cart_ingredient')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total_amount}'
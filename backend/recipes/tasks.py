@@ -0,0 +1,27 @@
+from api.cache import bump_catalogue_version
+from jobs.registry import task
+from recipes.cart import refresh_cart
+from recipes.images import create_variants
+from recipes.models import Recipe, ShoppingCart
+
+CART_REFRESH_BATCH = 500
+
+
+@task('recipes.create_variants')
+def create_image_variants(name):
+    '''Фоновое создание уменьшенных копий изображения рецепта'''
+    field = Recipe._meta.get_field('image')
+    create_variants(field.attr_class(None, field, name))
+    bump_catalogue_version(Recipe)
+
+
+@task('recipes.refresh_carts')
+def refresh_recipe_carts(recipe_id, user_ids=None, ingredient_ids=None):
+    '''Фоновый пересчёт корзин, содержащих рецепт, пачками пользователей'''
+    if user_ids is None:
+        user_ids = list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True))
+    for start in range(0, len(user_ids), CART_REFRESH_BATCH):
+        refresh_cart(user_ids[start:start + CART_REFRESH_BATCH],
+                     ingredient_ids)
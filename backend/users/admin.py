@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from recipes.admin import RefreshAdminMixin
+from recipes.counters import recount_authors, recount_deleted_users
 from users.models import Subscribe, User
 
 
@@ -7,12 +9,27 @@ from users.models import Subscribe, User
 class UserAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'username', 'email',
-        'first_name', 'last_name', 'date_joined'
+        'first_name', 'last_name', 'date_joined',
+        'recipes_count', 'followers_count'
     )
+    readonly_fields = ('recipes_count', 'followers_count')
     list_filter = ('email', 'first_name')
     empty_value_display = '-пусто-'
 
+    def delete_model(self, request, obj):
+        with recount_deleted_users([obj.id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        user_ids = list(queryset.values_list('id', flat=True))
+        with recount_deleted_users(user_ids):
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(RefreshAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
+
+    def refresh(self, collected):
+        recount_authors({item.author_id for item in collected},
+                        (Subscribe,))
@@ -47,6 +47,14 @@ class User(AbstractUser):
         choices=USER_ROLES,
         default='user',
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
 
     @property
     def is_admin(self):